@@ -0,0 +1,113 @@
+import threading
+import time
+
+
+class ActiveRun:
+    def __init__(self, session):
+        self.session = session
+        self.thread_id = None
+        self.run_id = None
+        self.handler = None
+        self.started_at = time.monotonic()
+        self.last_event_at = self.started_at
+        self.cancel_reason = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_reason is not None
+
+
+# The run each session is streaming, so it can be stopped from outside the
+# thread reading it: the Stop button, a reset, a closed browser tab or the
+# reaper. Cancelling aborts the open stream, which makes the blocked read fail
+# at once, and asks the API to cancel the run. A cancelled run stays
+# registered until its turn finishes, so a stream opened after the cancel
+# still finds it and stops, and the API run is cancelled once it is named.
+class RunRegistry:
+    def __init__(self, client, max_run_seconds=600, idle_seconds=120, sweep_interval=10, on_cancel=None):
+        self.client = client
+        self.max_run_seconds = max_run_seconds
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self.on_cancel = on_cancel
+        self._runs = {}
+        self._lock = threading.Lock()
+        self.cancels = {}
+        threading.Thread(target=self._reap, name="run-reaper", daemon=True).start()
+
+    def start(self, session):
+        # A session streams one run at a time; a leftover one is abandoned
+        self.cancel(session, "replaced")
+        run = ActiveRun(session)
+        with self._lock:
+            self._runs[session] = run
+        return run
+
+    def current(self, session):
+        with self._lock:
+            return self._runs.get(session)
+
+    def attach(self, run, handler):
+        run.handler = handler
+        run.last_event_at = time.monotonic()
+
+    def update(self, run, thread_id=None, run_id=None):
+        named = run.run_id
+        run.thread_id = thread_id or run.thread_id
+        run.run_id = run_id or run.run_id
+        run.last_event_at = time.monotonic()
+        if run.cancelled and run.run_id and not named:
+            self._cancel(run)
+
+    def finish(self, run):
+        with self._lock:
+            if self._runs.get(run.session) is run:
+                del self._runs[run.session]
+
+    def cancel(self, session, reason):
+        with self._lock:
+            run = self._runs.get(session)
+            if run is None or run.cancelled:
+                return False
+            run.cancel_reason = reason
+            self.cancels[reason] = self.cancels.get(reason, 0) + 1
+        self._cancel(run)
+        return True
+
+    def _cancel(self, run):
+        if run.handler is not None:
+            try:
+                run.handler.abort()
+            except Exception:
+                pass
+        if run.run_id and run.thread_id:
+            try:
+                self.client.beta.threads.runs.cancel(run.run_id, thread_id=run.thread_id)
+            except Exception as e:
+                # Already finished, or the API is unreachable; either way nothing is left to stop here
+                if self.on_cancel:
+                    self.on_cancel(run, e)
+                return
+        if self.on_cancel:
+            self.on_cancel(run, None)
+
+    def _reap(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            now = time.monotonic()
+            with self._lock:
+                stale = [
+                    (run.session, "max_age" if now - run.started_at > self.max_run_seconds else "idle")
+                    for run in self._runs.values()
+                    if not run.cancelled
+                    and (now - run.started_at > self.max_run_seconds or now - run.last_event_at > self.idle_seconds)
+                ]
+            for session, reason in stale:
+                self.cancel(session, reason)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active": sum(not run.cancelled for run in self._runs.values()),
+                "cancelled": dict(self.cancels),
+            }
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+
+
+class QueueTimeout(Exception):
+    pass
+
+
+# Refills continuously and holds at most one minute's worth of budget
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_seconds(self, amount, now):
+        self._refill(now)
+        # A single request larger than the bucket waits for a full bucket, then runs into debt
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+
+class Ticket:
+    def __init__(self, assistant_id, tokens):
+        self.assistant_id = assistant_id
+        self.tokens = tokens
+        self.queued_at = time.monotonic()
+        self.admitted_at = None
+
+    @property
+    def admitted(self):
+        return self.admitted_at is not None
+
+
+# Process-wide gate in front of every run. Each assistant gets at most
+# max_concurrent runs at once, and runs share request and token budgets per
+# minute. Turns that cannot start wait in one FIFO queue; the oldest waiting
+# turn of an assistant is always the next one of that assistant to start, and
+# the shared budgets go to the oldest waiting turn overall.
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent=0,
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        requests_per_run=1,
+        max_wait_seconds=300,
+        poll_interval=0.5,
+        on_change=None,
+        on_admit=None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.requests_per_run = requests_per_run
+        self.max_wait_seconds = max_wait_seconds
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self.on_admit = on_admit
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._waiting = deque()
+        self._running = {}
+        self._cond = threading.Condition()
+        self.admitted = 0
+        self.timeouts = 0
+
+    # Blocks until the turn may start a run. on_wait(position, waited_seconds)
+    # is called outside the lock at least every poll_interval while queued, so
+    # the caller can show progress and be interrupted.
+    def wait(self, assistant_id, tokens=0, on_wait=None):
+        ticket = Ticket(assistant_id, tokens)
+        deadline = ticket.queued_at + self.max_wait_seconds
+        with self._cond:
+            self._waiting.append(ticket)
+            self._changed(assistant_id)
+            self._dispatch()
+        try:
+            while True:
+                with self._cond:
+                    retry = self._dispatch()
+                    if ticket.admitted:
+                        break
+                    now = time.monotonic()
+                    if now >= deadline:
+                        self.timeouts += 1
+                        raise QueueTimeout(f"no run slot for {assistant_id} after {now - ticket.queued_at:.0f}s")
+                    position = self._waiting.index(ticket) + 1
+                if on_wait is not None:
+                    on_wait(position, now - ticket.queued_at)
+                with self._cond:
+                    if not ticket.admitted:
+                        timeout = min(self.poll_interval, deadline - now)
+                        self._cond.wait(min(timeout, retry) if retry else timeout)
+        except BaseException:
+            with self._cond:
+                if ticket.admitted:
+                    self._release(ticket)
+                else:
+                    self._waiting.remove(ticket)
+                    self._changed(assistant_id)
+            raise
+        if self.on_admit is not None:
+            self.on_admit(assistant_id, ticket.admitted_at - ticket.queued_at)
+        return ticket
+
+    # used_tokens replaces the estimate charged at admission once the run
+    # reports its usage
+    def release(self, ticket, used_tokens=None):
+        with self._cond:
+            if self._tokens is not None and used_tokens is not None:
+                self._tokens.take(used_tokens - ticket.tokens, time.monotonic())
+            self._release(ticket)
+
+    def _release(self, ticket):
+        self._running[ticket.assistant_id] -= 1
+        self._changed(ticket.assistant_id)
+        self._dispatch()
+
+    def _budget_wait(self, ticket, now):
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.wait_seconds(self.requests_per_run, now)
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_seconds(ticket.tokens, now))
+        return wait
+
+    # Starts every waiting turn that fits, oldest first. Returns how long until
+    # the budgets allow the oldest turn they are holding back, if any.
+    def _dispatch(self):
+        now = time.monotonic()
+        full = set()
+        started = []
+        retry = None
+        for ticket in self._waiting:
+            assistant_id = ticket.assistant_id
+            if assistant_id in full:
+                continue
+            if self.max_concurrent and self._running.get(assistant_id, 0) >= self.max_concurrent:
+                full.add(assistant_id)
+                continue
+            retry = self._budget_wait(ticket, now)
+            if retry > 0:
+                break
+            retry = None
+            if self._requests is not None:
+                self._requests.take(self.requests_per_run, now)
+            if self._tokens is not None:
+                self._tokens.take(ticket.tokens, now)
+            ticket.admitted_at = now
+            self._running[assistant_id] = self._running.get(assistant_id, 0) + 1
+            started.append(ticket)
+        for ticket in started:
+            self._waiting.remove(ticket)
+            self.admitted += 1
+            self._changed(ticket.assistant_id)
+        if started:
+            self._cond.notify_all()
+        return retry
+
+    def _changed(self, assistant_id):
+        if self.on_change is not None:
+            waiting = sum(1 for ticket in self._waiting if ticket.assistant_id == assistant_id)
+            self.on_change(assistant_id, waiting, self._running.get(assistant_id, 0))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "waiting": len(self._waiting),
+                "running": dict(self._running),
+                "admitted": self.admitted,
+                "timeouts": self.timeouts,
+            }
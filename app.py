@@ -1,106 +1,439 @@
+import time
+
+imports_started = time.perf_counter()
+
+import json
 import os
-import base64
+import logging
 import re
-import json
+import socket
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 import streamlit as st
-from streamlit_extras.stylable_container import stylable_container
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 #from st_click_detector import click_detector
-import openai
 from openai import AssistantEventHandler
-from tools import TOOL_MAP
+from tools import TOOL_MAP, ToolExecutor, preload as preload_tools
+from response_cache import ResponseCache
+from question_cache import QuestionCache
+from context_policy import ContextPolicy, count_turns, is_message, summarize, summary_text, window_start
+from rendering import StreamRenderer, rewrite_links
+from file_cache import FileCache, FileTooLarge
+from static_assets import AssetPipeline
+from event_recorder import EventRecorder
+from startup import Startup
+from warm_threads import WarmThreadPool
+from conversation_store import new_session_token, open_store
+from active_runs import RunRegistry
+from admission import AdmissionController, QueueTimeout
+from openai_client import TRANSIENT_RUN_ERRORS, backoff_seconds, build_client, is_transient
+from metrics import (
+    ERRORS_TOTAL,
+    OPENAI_RETRIES_TOTAL,
+    READY,
+    RUNS_CANCELLED_TOTAL,
+    SCRIPT_RUN_SECONDS,
+    STARTUP_SECONDS,
+    STARTUP_WARNINGS,
+    THREAD_POOL_TOTAL,
+    RunTrace,
+    observe_admission,
+    observe_queue,
+    observe_question_cache,
+    observe_stuck_tools,
+    observe_tool,
+    set_readiness,
+    start_http_server,
+    start_push_loop,
+)
 from typing_extensions import override
 from dotenv import load_dotenv
 
+# Only the first script run of the process imports anything; startup reports that one
+import_seconds = time.perf_counter() - imports_started
+
 load_dotenv()
 
-#Process Local Images Into Base64______________________________
-# encodedImage1 = None     
-# encodedImage2 = None
-# encodedImage3 = None
-# encodedImage4 = None
-# encodedImage5 = None
-# encodedImage6 = None
-# encodedImage7 = None
+logger = logging.getLogger(__name__)
 
-# with open('assets/1.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage1 = f"data:image/jpeg;base64,{encoded}"
 
-# with open('assets/2.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage2 = f"data:image/jpeg;base64,{encoded}"
+def str_to_bool(str_input):
+    if not isinstance(str_input, str):
+        return False
+    return str_input.lower() == "true"
 
-# with open('assets/3.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage3 = f"data:image/jpeg;base64,{encoded}"
 
-# with open('assets/4.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage4 = f"data:image/jpeg;base64,{encoded}"
+# Load environment variables
+openai_api_key = os.environ.get("OPENAI_API_KEY")
+single_agent_id = os.environ.get("ASSISTANT_ID", None)
+single_agent_title = os.environ.get("ASSISTANT_TITLE", "Assistants API UI")
+# [{"id": ..., "title": ...}]; every listed assistant is checked and warmed at startup
+configured_assistants = json.loads(os.environ.get("OPENAI_ASSISTANTS") or "[]")
+instructions = os.environ.get("RUN_INSTRUCTIONS", "")
+enabled_file_upload_message = False
+admin_token = os.environ.get("ADMIN_TOKEN")
+simulate_cached_stream = str_to_bool(os.environ.get("STARTER_CACHE_SIMULATE_STREAM"))
+chat_history_window = int(os.environ.get("CHAT_HISTORY_WINDOW", 20))
+metrics_port = int(os.environ.get("METRICS_PORT", 0))
+metrics_push_url = os.environ.get("METRICS_PUSH_URL")
+metrics_push_interval = float(os.environ.get("METRICS_PUSH_INTERVAL", 15))
+# How a new conversation gets its thread: "default", "pool" or "combined"
+thread_start_mode = os.environ.get("THREAD_START_MODE", "default")
+warm_thread_pool_size = int(os.environ.get("WARM_THREAD_POOL_SIZE", 5))
+warm_thread_max_age = float(os.environ.get("WARM_THREAD_MAX_AGE", 3600))
+run_retries = int(os.environ.get("RUN_RETRIES", 2))
+run_retry_backoff = float(os.environ.get("RUN_RETRY_BACKOFF", 0.5))
+run_max_seconds = float(os.environ.get("RUN_MAX_SECONDS", 600))
+run_idle_seconds = float(os.environ.get("RUN_IDLE_SECONDS", 120))
+# Admission control shared by all sessions; 0 turns a limit off
+max_concurrent_runs = int(os.environ.get("MAX_CONCURRENT_RUNS", 20))
+run_requests_per_minute = float(os.environ.get("RUN_REQUESTS_PER_MINUTE", 0))
+run_tokens_per_minute = float(os.environ.get("RUN_TOKENS_PER_MINUTE", 0))
+run_token_estimate = int(os.environ.get("RUN_TOKEN_ESTIMATE", 4000))
+run_queue_timeout = float(os.environ.get("RUN_QUEUE_TIMEOUT", 300))
+# Answers kept for near-duplicate first questions; 0 turns the question cache off
+question_cache_size = int(os.environ.get("QUESTION_CACHE_SIZE", 10000))
+context_mode = os.environ.get("CONTEXT_MODE", "full")
+# Raw run events of sampled turns, for replaying through the EventHandler; empty turns recording off
+event_record_dir = os.environ.get("EVENT_RECORD_DIR", "")
+conversation_store_url = os.environ.get("CONVERSATION_STORE", "sqlite:///data/conversations.db")
+conversation_max_age_days = float(os.environ.get("CONVERSATION_MAX_AGE_DAYS", 30))
+# Chat entries kept in session state; older ones are read back from the store
+session_max_messages = max(chat_history_window, int(os.environ.get("SESSION_MAX_MESSAGES", 50)))
+SESSION_COOKIE = "diversions_session"
 
-# with open('assets/5.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage5 = f"data:image/jpeg;base64,{encoded}"
+st.set_page_config(page_title = "Diversions Bot",page_icon="./favicon.ico",layout="wide")
 
-# with open('assets/6.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage6 = f"data:image/jpeg;base64,{encoded}"
+# Starter buttons as (key, label, prompt); each list is one row of the button grid
+PLAYER_COUNT_STARTERS = [
+    ("playerOne", "1 Player", "What are some of your top rated games for only 1 player; especially if the best player count is 1?"),
+    ("playerTwo", "2 Players", "What are some of your top rated games for only 2 players; especially if the best player count is 2?"),
+    ("playerThree", "3 Players", "What are some of your top rated games for 3 players; especially if the best player count is 3?"),
+    ("playerFour", "4 Players", "What are some of your top rated games for 4 players; especially if the best player count is 4?"),
+    ("playerFive", "5 Players", "What are some of your top rated games for 5 players; especially if the best player count is 5?"),
+    ("playerSix", "6 Players", "What are some of your top rated games for 6 players; especially if the best player count is 6?"),
+    ("playerSeven", "7 Players", "What are some of your top rated games for 7 or more players; especially if the best player count is 7 or more?"),
+]
+ALTERNATE_STARTERS = [
+    ("Teach", "Teach me about board games", "I'm not super familiar with board game terminology, so I'm not sure how to ask you for recommendations. Could you tell me a bit about a few types of board games?"),
+    ("Unsure", "I'm not sure where to start", "I'm a bit unsure how to start because I'm a bit new to board games. Could you help me figure out how where to start?"),
+    ("Shuffle", "Shuffle and deal me", "Surprise me! With equal odds for every game in the library, could you randomly pick 5 games and give them to me?"),
+]
+# Player count buttons show these images in place of their labels
+STARTER_IMAGES = {key: f"assets/{number}.png" for number, (key, _, _) in enumerate(PLAYER_COUNT_STARTERS, 1)}
+LOGO_IMAGE = "DiversionsLogo.png"
+STARTER_PROMPTS = {key: prompt for key, _, prompt in PLAYER_COUNT_STARTERS + ALTERNATE_STARTERS}
+
+# Shuffle is meant to be random, so its answer is never cached
+UNCACHED_STARTERS = {"Shuffle"}
+
+
+# One client per process so every session shares the connection pool
+@st.cache_resource
+def get_client():
+    return build_client(
+        openai_api_key,
+        max_connections=int(os.environ.get("OPENAI_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", 30)),
+        http2=str_to_bool(os.environ.get("OPENAI_HTTP2")),
+        timeout=float(os.environ.get("OPENAI_TIMEOUT", 60)),
+        connect_timeout=float(os.environ.get("OPENAI_CONNECT_TIMEOUT", 5)),
+        max_retries=int(os.environ.get("OPENAI_MAX_RETRIES", 3)),
+    )
 
-# with open('assets/7.png','rb') as f:
-#     encoded = base64.b64encode(f.read()).decode()
-#     encodedImage7 = f"data:image/jpeg;base64,{encoded}"
 
+# Runs once per process in the background: warms the connection pool, retrieves
+# every configured assistant and checks its functions against TOOL_MAP. /ready
+# on METRICS_PORT answers 200 once ASSISTANT_ID was retrieved; problems with
+# the other assistants and functions missing from TOOL_MAP show there as warnings.
+@st.cache_resource
+def get_startup():
+    READY.set(0)
+    startup = Startup(
+        get_client(),
+        [assistant_id for assistant_id in [single_agent_id] + [a["id"] for a in configured_assistants] if assistant_id],
+        TOOL_MAP,
+        # The page serves ASSISTANT_ID; OPENAI_ASSISTANTS entries are only warmed and checked
+        required=[single_agent_id] if single_agent_id else [],
+        preload=preload_tools,
+        connections=int(os.environ.get("STARTUP_WARM_CONNECTIONS", 4)),
+        retry_seconds=float(os.environ.get("STARTUP_RETRY_SECONDS", 30)),
+        import_seconds=import_seconds,
+        on_timing=lambda step, seconds: STARTUP_SECONDS.set(round(seconds, 4), step=step),
+        on_problem=lambda key: ERRORS_TOTAL.inc(stage="startup"),
+        on_warning=STARTUP_WARNINGS.set,
+        on_finish=lambda ready: READY.set(int(ready)),
+    )
+    set_readiness(lambda: (startup.ready, startup.report()))
+    return startup
 
-#Finished Pre-Processing Images________________________________
 
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(
+        ttl_seconds=int(os.environ.get("STARTER_CACHE_TTL", 3600)),
+        max_entries=int(os.environ.get("STARTER_CACHE_SIZE", 128)),
+    )
 
-def str_to_bool(str_input):
-    if not isinstance(str_input, str):
-        return False
-    return str_input.lower() == "true"
 
+@st.cache_resource
+def get_question_cache():
+    return QuestionCache(
+        threshold=float(os.environ.get("QUESTION_CACHE_THRESHOLD", 0.85)),
+        ttl_seconds=int(os.environ.get("QUESTION_CACHE_TTL", 3600)),
+        max_entries=question_cache_size,
+        sample_rate=float(os.environ.get("QUESTION_CACHE_SAMPLE_RATE", 0.05)),
+        listener=observe_question_cache,
+    )
 
-# Load environment variables
-openai_api_key = os.environ.get("OPENAI_API_KEY")
-instructions = os.environ.get("RUN_INSTRUCTIONS", "")
-enabled_file_upload_message = False
 
-client = openai.OpenAI(api_key=openai_api_key)
+# Assistant-generated files are served from ./static via Streamlit static serving
+@st.cache_resource
+def get_context_policy():
+    return ContextPolicy(
+        mode=context_mode,
+        last_messages=int(os.environ.get("CONTEXT_LAST_MESSAGES", 10)),
+        max_prompt_tokens=int(os.environ.get("CONTEXT_MAX_PROMPT_TOKENS", 0)),
+        max_completion_tokens=int(os.environ.get("CONTEXT_MAX_COMPLETION_TOKENS", 0)),
+        fresh_after_turns=int(os.environ.get("CONTEXT_FRESH_AFTER_TURNS", 20)),
+        summary_chars=int(os.environ.get("CONTEXT_SUMMARY_CHARS", 2000)),
+    )
+
+
+@st.cache_resource
+def get_file_cache():
+    return FileCache(
+        os.path.join("static", "files"),
+        "app/static/files",
+        int(os.environ.get("FILE_CACHE_MAX_MB", 512)) * 1024 * 1024,
+    )
+
+
+# Page images, resized and recompressed on first use and served from ./static
+@st.cache_resource
+def get_asset_pipeline():
+    return AssetPipeline(os.path.join("static", "assets"), "app/static/assets")
+
+
+@st.cache_resource
+def get_event_recorder():
+    return EventRecorder(
+        event_record_dir,
+        sample_rate=float(os.environ.get("EVENT_RECORD_SAMPLE_RATE", 1.0)),
+        slow_seconds=float(os.environ.get("EVENT_RECORD_SLOW_SECONDS", 0)),
+        secrets=[openai_api_key, os.environ.get("AZURE_OPENAI_KEY"), admin_token],
+    )
+
+
+@st.cache_resource
+def get_tool_executor():
+    return ToolExecutor(TOOL_MAP, listener=observe_tool, on_stuck=observe_stuck_tools)
+
+
+@st.cache_resource
+def get_warm_thread_pool():
+    return WarmThreadPool(
+        get_client(),
+        warm_thread_pool_size,
+        max_age_seconds=warm_thread_max_age,
+        on_error=lambda e: ERRORS_TOTAL.inc(stage="warm_thread_pool"),
+    )
+
+
+def on_run_cancelled(run, error):
+    RUNS_CANCELLED_TOTAL.inc(reason=run.cancel_reason)
+    if error is not None:
+        ERRORS_TOTAL.inc(stage="run_cancel")
+        logger.warning("could not cancel run %s on thread %s: %s", run.run_id, run.thread_id, error)
+
+
+# Runs are keyed by the browser tab's Streamlit session rather than the
+# conversation token, which several tabs or devices can share: a run started,
+# stopped or reset in one of them leaves the others' runs alone
+def tab_id():
+    return get_script_run_ctx().session_id
+
+
+@st.cache_resource
+def get_run_registry():
+    return RunRegistry(
+        get_client(),
+        max_run_seconds=run_max_seconds,
+        idle_seconds=run_idle_seconds,
+        sweep_interval=min(10, run_idle_seconds / 2),
+        on_cancel=on_run_cancelled,
+    )
+
+
+# Creating the message and starting the run
+REQUESTS_PER_RUN = 2
+
+
+@st.cache_resource
+def get_admission_controller():
+    return AdmissionController(
+        max_concurrent=max_concurrent_runs,
+        requests_per_minute=run_requests_per_minute,
+        tokens_per_minute=run_tokens_per_minute,
+        requests_per_run=REQUESTS_PER_RUN,
+        max_wait_seconds=run_queue_timeout,
+        on_change=observe_queue,
+        on_admit=observe_admission,
+    )
+
+
+@st.cache_resource
+def get_conversation_store():
+    store = open_store(conversation_store_url)
+    if conversation_max_age_days:
+        store.prune(conversation_max_age_days * 86400)
+    return store
+
+
+@st.cache_resource
+def start_metrics_export():
+    if metrics_port:
+        start_http_server(metrics_port)
+    if metrics_push_url:
+        start_push_loop(metrics_push_url, metrics_push_interval)
+
+
+TURN_THREAD = "turn"
+# How soon Stop, Reset or a closed tab interrupts a turn
+STOP_POLL_SECONDS = 0.1
+FINISHED_RUN_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete"}
+FAILED_RUN_STATUSES = {"failed", "expired"}
+INCOMPLETE_NOTE = "*(This answer was cut short. Ask me to go on for the rest.)*"
+CODE_INPUT_TEMPLATE = "### code interpreter\ninput:\n```python\n{}\n```"
 
-st.set_page_config(page_title = "Diversions Bot",page_icon="./favicon.ico",layout="wide")
 
 class EventHandler(AssistantEventHandler):
+    def __init__(self, trace):
+        super().__init__()
+        self.trace = trace
+        self.text_renderer = None
+        self.tool_input_renderer = None
+        self.submitted_run_id = None
+        # Each stream the turn reads is its own segment of the recording
+        self.recording = trace.recording
+        if self.recording is not None:
+            self.segment = self.recording.open_segment()
+        # Registered so a cancel from another thread can close this stream. Looked up
+        # once here: on_event runs for every delta and a cache_resource lookup is not free
+        self.run_registry = get_run_registry()
+        self.active_run = self.run_registry.current(tab_id())
+        if self.active_run is not None:
+            self.run_registry.attach(self.active_run, self)
+
+    # A cancelled run's turn is over; its stream may still deliver events, which
+    # must not draw into the tab's next script run
+    @property
+    def stopped(self):
+        return self.active_run is not None and self.active_run.cancelled
+
+    @property
+    def partial_text(self):
+        return self.text_renderer.text if self.text_renderer is not None else ""
+
+    # _init is private to the SDK (written against openai 1.70) and the socket
+    # comes from httpcore's network_stream extension. Each step checks that
+    # what it reaches for is there, so after an upgrade abort falls back to
+    # closing the response instead of failing.
+    @override
+    def _init(self, stream):
+        super()._init(stream)
+        self.response = getattr(stream, "response", None)
+
+    def abort(self):
+        # Closing the socket does not wake a read blocked on a silent stream, shutting it down does.
+        # The reading thread then sees the stream end and closes it; closing it from here as well
+        # could hand its file descriptor to a new connection while that thread is about to poll it.
+        # HTTP/2 streams share the connection with other sessions, so they are only closed.
+        response = getattr(self, "response", None)
+        if response is None:
+            self.close()
+            return
+        if getattr(response, "http_version", None) == "HTTP/1.1":
+            extensions = getattr(response, "extensions", None) or {}
+            network_stream = extensions.get("network_stream")
+            if hasattr(network_stream, "get_extra_info"):
+                sock = network_stream.get_extra_info("socket")
+                if hasattr(sock, "shutdown"):
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                        return
+                    except OSError:
+                        pass
+        response.close()
+
     @override
     def on_event(self, event):
-        pass
+        if self.recording is not None:
+            self.recording.add(self.segment, event)
+        if self.active_run is not None:
+            run_id = event.data.id if getattr(event.data, "object", None) == "thread.run" else None
+            thread_id = getattr(event.data, "thread_id", None) or (
+                event.data.id if event.event == "thread.created" else None
+            )
+            self.run_registry.update(self.active_run, thread_id=thread_id, run_id=run_id)
+            if self.active_run.cancelled:
+                self.abort()
+                return
+        if event.event == "thread.created":
+            set_thread_id(event.data.id)
+            self.trace.thread_id = event.data.id
+        elif event.event.startswith("thread.run.") and event.data.object == "thread.run":
+            self.trace.run_id = event.data.id
+            self.trace.run_status = event.data.status
+            if event.data.usage:
+                self.trace.add_usage(event.data.usage)
+            if event.data.last_error:
+                self.trace.run_error_code = event.data.last_error.code
+            if event.event == "thread.run.in_progress":
+                self.trace.mark("in_progress")
 
     @override
     def on_text_created(self, text):
+        if self.stopped:
+            return
         st.session_state.current_message = ""
         with st.chat_message("Assistant"):
             st.session_state.current_markdown = st.empty()
+        self.trace.mark("text_created")
+        self.text_renderer = StreamRenderer(
+            st.session_state.current_markdown, rewrite=rewrite_links
+        )
 
     @override
     def on_text_delta(self, delta, snapshot):
-        if snapshot.value:
-            text_value = re.sub(
-                r"\[(.*?)\]\s*\(\s*(.*?)\s*\)", "Download Link", snapshot.value
-            )
-            st.session_state.current_message = text_value
-            st.session_state.current_markdown.markdown(
-                st.session_state.current_message, True
-            )
+        if self.stopped:
+            return
+        if delta.value:
+            self.trace.deltas += 1
+            if self.trace.deltas == 1:
+                self.trace.mark("first_delta")
+            self.text_renderer.append(delta.value)
 
     @override
     def on_text_done(self, text):
+        if self.stopped:
+            return
         format_text = format_annotation(text)
         #format_text = text.value
         st.session_state.current_markdown.markdown(format_text, True)
-        st.session_state.chat_log.append({"name": "assistant", "msg": format_text})
+        append_chat({"name": "assistant", "msg": format_text})
+        self.text_renderer = None
+
+    @override
+    def on_message_done(self, message):
+        self.trace.message_ids.append(message.id)
 
     @override
     def on_tool_call_created(self, tool_call):
+        if self.stopped:
+            return
         if tool_call.type == "code_interpreter":
             st.session_state.current_tool_input = ""
             with st.chat_message("Assistant"):
@@ -108,6 +441,8 @@ class EventHandler(AssistantEventHandler):
 
     @override
     def on_tool_call_delta(self, delta, snapshot):
+        if self.stopped:
+            return
         if 'current_tool_input_markdown' not in st.session_state:
             with st.chat_message("Assistant"):
                 st.session_state.current_tool_input_markdown = st.empty()
@@ -115,8 +450,12 @@ class EventHandler(AssistantEventHandler):
         if delta.type == "code_interpreter":
             if delta.code_interpreter.input:
                 st.session_state.current_tool_input += delta.code_interpreter.input
-                input_code = f"### code interpreter\ninput:\n```python\n{st.session_state.current_tool_input}\n```"
-                st.session_state.current_tool_input_markdown.markdown(input_code, True)
+                if self.tool_input_renderer is None:
+                    self.tool_input_renderer = StreamRenderer(
+                        st.session_state.current_tool_input_markdown,
+                        template=CODE_INPUT_TEMPLATE,
+                    )
+                self.tool_input_renderer.append(delta.code_interpreter.input)
 
             if delta.code_interpreter.outputs:
                 for output in delta.code_interpreter.outputs:
@@ -125,22 +464,27 @@ class EventHandler(AssistantEventHandler):
 
     @override
     def on_tool_call_done(self, tool_call):
+        if self.stopped:
+            return
+        if self.tool_input_renderer is not None:
+            self.tool_input_renderer.flush(final=True)
+            self.tool_input_renderer = None
+        # The stream reports a tool call done again at each later step and at the end of the run
+        seen = tool_call.id in [x.id for x in st.session_state.tool_calls]
         st.session_state.tool_calls.append(tool_call)
         if tool_call.type == "code_interpreter":
-            if tool_call.id in [x.id for x in st.session_state.tool_calls]:
+            if seen:
                 return
             input_code = f"### code interpreter\ninput:\n```python\n{tool_call.code_interpreter.input}\n```"
             st.session_state.current_tool_input_markdown.markdown(input_code, True)
-            st.session_state.chat_log.append({"name": "assistant", "msg": input_code})
+            append_chat({"name": "assistant", "msg": input_code})
             st.session_state.current_tool_input_markdown = None
             for output in tool_call.code_interpreter.outputs:
                 if output.type == "logs":
                     output = f"### code interpreter\noutput:\n```\n{output.logs}\n```"
                     with st.chat_message("Assistant"):
                         st.markdown(output, True)
-                        st.session_state.chat_log.append(
-                            {"name": "assistant", "msg": output}
-                        )
+                        append_chat({"name": "assistant", "msg": output})
         elif (
             tool_call.type == "function"
             and self.current_run.status == "requires_action"
@@ -148,84 +492,575 @@ class EventHandler(AssistantEventHandler):
             with st.chat_message("Assistant"):
                 msg = f"### Function Calling: {tool_call.function.name}"
                 st.markdown(msg, True)
-                st.session_state.chat_log.append({"name": "assistant", "msg": msg})
-            tool_calls = self.current_run.required_action.submit_tool_outputs.tool_calls
-            tool_outputs = []
-            for submit_tool_call in tool_calls:
-                tool_function_name = submit_tool_call.function.name
-                tool_function_arguments = json.loads(
-                    submit_tool_call.function.arguments
-                )
-                tool_function_output = TOOL_MAP[tool_function_name](
-                    **tool_function_arguments
-                )
-                tool_outputs.append(
-                    {
-                        "tool_call_id": submit_tool_call.id,
-                        "output": tool_function_output,
-                    }
-                )
-
-            with client.beta.threads.runs.submit_tool_outputs_stream(
-                thread_id=st.session_state.thread.id,
-                run_id=self.current_run.id,
-                tool_outputs=tool_outputs,
-                event_handler=EventHandler(),
-            ) as stream:
+                append_chat({"name": "assistant", "msg": msg})
+            # Every function call of the run is answered at once; later done events are no-ops
+            if self.submitted_run_id == self.current_run.id:
+                return
+            self.submitted_run_id = self.current_run.id
+            outputs = submit_tool_outputs(self.current_run, self.trace)
+            # Stop can land while the tools run; their outputs then have nowhere to go
+            if self.stopped:
+                return
+            with outputs as stream:
                 stream.until_done()
 
 
-def create_thread(content, file):
-    return client.beta.threads.create()
+def submit_tool_outputs(run, trace):
+    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+    trace.tools.extend(tool_call.function.name for tool_call in tool_calls)
+    with trace.span("tools"):
+        tool_outputs = get_tool_executor().run(tool_calls)
+    return get_client().beta.threads.runs.submit_tool_outputs_stream(
+        thread_id=run.thread_id,
+        run_id=run.id,
+        tool_outputs=tool_outputs,
+        event_handler=EventHandler(trace),
+    )
 
 
-def create_message(thread, content, file):
-    client.beta.threads.messages.create(
-        thread_id=thread.id, role="user", content=content, attachments=[]
+def create_thread(content, file):
+    # A replayed cached answer leaves its exchange here so follow-ups keep the context
+    seed = st.session_state.pop("thread_seed", None)
+    if seed:
+        return get_client().beta.threads.create(messages=seed)
+    if thread_start_mode == "pool":
+        thread = get_warm_thread_pool().take()
+        THREAD_POOL_TOTAL.inc(outcome="hit" if thread else "miss")
+        if thread is not None:
+            return thread
+    return get_client().beta.threads.create()
+
+
+def create_message(thread_id, content, file):
+    get_client().beta.threads.messages.create(
+        thread_id=thread_id, role="user", content=content, attachments=[]
     )
 
 
 def create_file_link(file_name, file_id):
-    content = client.files.content(file_id)
-    content_type = content.response.headers["content-type"]
-    b64 = base64.b64encode(content.text.encode(content.encoding)).decode()
-    link_tag = f'<a href="data:{content_type};base64,{b64}" download="{file_name}">Download Link</a>'
+    try:
+        url = get_file_cache().fetch(get_client(), file_id, file_name)
+    except FileTooLarge:
+        logger.warning("not linking %s (%s): too large for static serving", file_name, file_id)
+        return f"{file_name} (too large to download here)"
+    link_tag = f'<a href="{url}" download="{file_name}">Download Link</a>'
     return link_tag
 
 
 def format_annotation(text):
     text_value = text.value
+    for annotation in text.annotations:
+        if file_path := getattr(annotation, "file_path", None):
+            link_tag = create_file_link(
+                annotation.text.split("/")[-1], file_path.file_id
+            )
+            text_value = re.sub(
+                r"\[([^\]]*)\]\(\s*" + re.escape(annotation.text) + r"\s*\)",
+                lambda _: link_tag,
+                text_value,
+            )
     text_value = re.sub("【(.*?)】", "", text_value)
     return text_value
 
 
-def run_stream(user_input, file, selected_assistant_id):
-    try:
-        if "thread" not in st.session_state:
-            st.session_state.thread = create_thread(user_input, file)
-        create_message(st.session_state.thread, user_input, file)
-        with client.beta.threads.runs.stream(
-            thread_id=st.session_state.thread.id,
+# Rolls the messages runs no longer read into the session's summary. In
+# "fresh" mode a conversation past fresh_after_turns moves to a new thread
+# seeded with the summary and the last messages; the question being asked is
+# added after them.
+def prepare_context():
+    policy = get_context_policy()
+    if not policy.rolls_up or "thread_id" not in st.session_state:
+        return
+    start = st.session_state.context_start
+    entries = chat_entries(start, chat_length())
+    if policy.mode == "fresh":
+        if count_turns(entries) <= policy.fresh_after_turns:
+            return
+        if entries and entries[-1]["name"] == "user":
+            entries = entries[:-1]
+    cut = window_start(entries, start, policy.last_messages)
+    if cut > start:
+        st.session_state.context_summary = policy.extend_summary(
+            st.session_state.context_summary, summarize(entries[:cut - start])
+        )
+        st.session_state.context_start = cut
+    if policy.mode == "fresh":
+        seed = [{"role": "assistant", "content": summary_text(st.session_state.context_summary)}]
+        seed += [
+            {"role": entry["name"], "content": entry["msg"]}
+            for entry in entries[cut - start:]
+            if is_message(entry)
+        ]
+        logger.info(
+            "moving session %s from thread %s to a fresh thread with %d messages",
+            st.session_state.session_id, st.session_state.thread_id, len(seed),
+        )
+        st.session_state.thread_seed = seed
+        del st.session_state.thread_id
+
+
+def context_run_options():
+    return get_context_policy().run_options(st.session_state.context_summary)
+
+
+def start_run(user_input, file, selected_assistant_id, trace):
+    prepare_context()
+    # "combined" starts a fresh conversation with one create-thread-and-run request
+    if "thread_id" not in st.session_state and thread_start_mode == "combined":
+        messages = st.session_state.pop("thread_seed", None) or []
+        messages.append({"role": "user", "content": user_input})
+        return get_client().beta.threads.create_and_run_stream(
             assistant_id=selected_assistant_id,
-            event_handler=EventHandler(),
-        ) as stream:
-            stream.until_done()
-        return True
-    except:
-        return False
+            thread={"messages": messages},
+            event_handler=EventHandler(trace),
+            **context_run_options(),
+        )
+    if "thread_id" not in st.session_state:
+        with trace.span("create_thread"):
+            set_thread_id(create_thread(user_input, file).id)
+    trace.thread_id = st.session_state.thread_id
+    with trace.span("create_message"):
+        create_message(st.session_state.thread_id, user_input, file)
+    return get_client().beta.threads.runs.stream(
+        thread_id=st.session_state.thread_id,
+        assistant_id=selected_assistant_id,
+        event_handler=EventHandler(trace),
+        **context_run_options(),
+    )
+
+
+def show_run_messages(run, trace):
+    messages = get_client().beta.threads.messages.list(
+        thread_id=run.thread_id, run_id=run.id, order="asc"
+    )
+    for message in messages:
+        if message.id in trace.message_ids:
+            continue
+        trace.message_ids.append(message.id)
+        for content in message.content:
+            if content.type == "text":
+                msg = format_annotation(content.text)
+                with st.chat_message("Assistant"):
+                    st.markdown(msg, True)
+                append_chat({"name": "assistant", "msg": msg})
+
+
+def resume_run(selected_assistant_id, trace, attempt):
+    # The user's message is already on the thread: pick the run back up if it is
+    # still going, otherwise start a new run that answers it
+    thread_id = st.session_state.thread_id
+    delay = backoff_seconds(attempt, run_retry_backoff)
+    OPENAI_RETRIES_TOTAL.inc(layer="run")
+    logger.warning(
+        "resuming run %s on thread %s (status %s) in %.2fs",
+        trace.run_id, thread_id, trace.run_status, delay,
+    )
+    time.sleep(delay)
+    if trace.run_id and trace.run_status not in FAILED_RUN_STATUSES:
+        run = get_client().beta.threads.runs.poll(trace.run_id, thread_id=thread_id)
+        trace.run_status = run.status
+        trace.run_error_code = run.last_error.code if run.last_error else None
+        if run.status == "requires_action":
+            return submit_tool_outputs(run, trace)
+        if run.status == "completed":
+            show_run_messages(run, trace)
+            return None
+        if run.status != "failed" or trace.run_error_code not in TRANSIENT_RUN_ERRORS:
+            return None
+    trace.run_id = trace.run_status = trace.run_error_code = None
+    return get_client().beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=selected_assistant_id,
+        event_handler=EventHandler(trace),
+        **context_run_options(),
+    )
+
+
+def finish_cancelled(active, trace):
+    # Whatever was streamed before the cancel stays in the conversation
+    text = active.handler.partial_text if active.handler is not None else ""
+    if text:
+        append_chat({"name": "assistant", "msg": re.sub("【(.*?)】", "", rewrite_links(text)) + "\n\n*(stopped)*"})
+    trace.finish("cancelled")
+
 
+# Waits for a run slot, showing the turn's place in line under the spinner.
+# The estimate stands in for the run's tokens until it reports its usage.
+def wait_for_slot(assistant_id, user_input):
+    status = None
+    shown = None
 
+    def show_position(position, waited):
+        nonlocal status, shown
+        text = f"We're helping a lot of players right now. You're number {position} in line ({waited:.0f}s)"
+        if text != shown:
+            status = status or st.empty()
+            status.caption(text)
+            shown = text
+
+    ticket = get_admission_controller().wait(
+        assistant_id, len(user_input) // 4 + run_token_estimate, on_wait=show_position
+    )
+    if status is not None:
+        status.empty()
+    return ticket
+
+
+# A recorder that cannot start only costs the turn its recording
+def start_recording(trace, assistant_id, user_input):
+    try:
+        trace.recording = get_event_recorder().start(assistant_id, trace.kind, user_input)
+    except Exception:
+        logger.exception("could not start recording the events of a run")
+        ERRORS_TOTAL.inc(stage="event_record")
+
+
+def save_recording(trace):
+    try:
+        get_event_recorder().save(trace.recording, trace.outcome, trace.run_id)
+    except Exception:
+        logger.exception("could not save the events of run %s", trace.run_id)
+        ERRORS_TOTAL.inc(stage="event_record")
+
+
+# Creates the thread and message, streams the run and resumes it after
+# transient failures, until it finishes or is cancelled
+def stream_turn(user_input, file, selected_assistant_id, trace, active):
+    run = start_run(user_input, file, selected_assistant_id, trace)
+    attempt = 0
+    while run is not None and not active.cancelled:
+        can_resume = attempt < run_retries and "thread_id" in st.session_state
+        try:
+            with trace.span("stream"):
+                with run as stream:
+                    stream.until_done()
+        except Exception as e:
+            if active.cancelled or not is_transient(e) or not can_resume:
+                raise
+        else:
+            finished = (
+                trace.run_status in FINISHED_RUN_STATUSES
+                and trace.run_error_code not in TRANSIENT_RUN_ERRORS
+            )
+            if finished or not can_resume:
+                break
+        if active.cancelled:
+            # An aborted stream ends like a dropped one; it must not be resumed
+            break
+        run = resume_run(selected_assistant_id, trace, attempt)
+        attempt += 1
+
+
+# Runs function on a worker thread that shares the script's context, so it can
+# draw, while the script thread waits in short slices. Streamlit raises a
+# pending Stop, rerun or closed tab only when the script touches the page or
+# its session state, so without this a turn blocked on a tool, an API request
+# or a queued run could not be stopped until that returned. On the way out
+# the caller cancels the run, which ends the worker's stream.
+def run_interruptibly(function, *args):
+    future = Future()
+
+    def work():
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    worker = threading.Thread(target=work, name=TURN_THREAD, daemon=True)
+    add_script_run_ctx(worker)
+    worker.start()
+    while True:
+        try:
+            return future.result(timeout=STOP_POLL_SECONDS)
+        except FutureTimeoutError:
+            # A session state read is where Streamlit raises a pending stop or rerun
+            st.session_state.get("in_progress")
+
+
+# Returns the turn's outcome: "ok" for a completed run, "incomplete", "cancelled" or "error"
+def run_stream(user_input, file, selected_assistant_id):
+    trace = RunTrace(selected_assistant_id)
+    try:
+        ticket = wait_for_slot(selected_assistant_id, user_input)
+    except QueueTimeout as e:
+        logger.warning("%s", e)
+        trace.error = "queue_timeout"
+        trace.finish("error")
+        return "error"
+    except BaseException:
+        trace.finish("cancelled")
+        raise
+    try:
+        if event_record_dir:
+            start_recording(trace, selected_assistant_id, user_input)
+        registry = get_run_registry()
+        active = registry.start(tab_id())
+    except BaseException as e:
+        # The finally below releases the slot only once the run is registered
+        get_admission_controller().release(ticket)
+        trace.finish("error" if isinstance(e, Exception) else "cancelled")
+        raise
+    try:
+        run_interruptibly(stream_turn, user_input, file, selected_assistant_id, trace, active)
+        if active.cancelled:
+            finish_cancelled(active, trace)
+            return "cancelled"
+        if trace.run_status not in FINISHED_RUN_STATUSES or trace.run_status in FAILED_RUN_STATUSES:
+            trace.error = trace.error or f"run_{trace.run_status}"
+            trace.finish("error")
+            return "error"
+        if trace.run_status == "incomplete":
+            # A token limit cut the answer short; what was streamed stays, marked as partial
+            append_chat({"name": "assistant", "msg": INCOMPLETE_NOTE, "note": True})
+            trace.finish("incomplete")
+            return "incomplete"
+        if trace.run_status == "cancelled":
+            trace.finish("cancelled")
+            return "cancelled"
+        trace.finish("ok")
+        return "ok"
+    except Exception:
+        if active.cancelled:
+            # The reaper stopped a run that stalled or ran too long
+            logger.warning("run %s on thread %s cancelled: %s", active.run_id, active.thread_id, active.cancel_reason)
+            finish_cancelled(active, trace)
+            return "cancelled"
+        logger.exception("run failed on thread %s", trace.thread_id)
+        trace.finish("error")
+        return "error"
+    except BaseException:
+        # Streamlit stops the script when the user presses Stop or Reset, or closes the tab
+        registry.cancel(active.session, "interrupted")
+        finish_cancelled(active, trace)
+        raise
+    finally:
+        if trace.run_status not in FINISHED_RUN_STATUSES:
+            registry.cancel(active.session, "error")
+        registry.finish(active)
+        get_admission_controller().release(ticket, trace.usage_tokens)
+        if trace.recording is not None:
+            save_recording(trace)
+
+
+def simulate_stream(placeholder, text, chunk_size=24, delay=0.01):
+    for end in range(chunk_size, len(text) + chunk_size, chunk_size):
+        placeholder.markdown(text[:end], True)
+        time.sleep(delay)
+
+
+def replay_messages(messages):
+    for message in messages:
+        with st.chat_message(message["name"]):
+            placeholder = st.empty()
+            if simulate_cached_stream:
+                simulate_stream(placeholder, message["msg"])
+            placeholder.markdown(message["msg"], True)
+        append_chat(message)
+
+
+def replay_cached_answer(prompt, messages, assistant_id, kind):
+    trace = RunTrace(assistant_id, kind=kind)
+    trace.mark("first_delta")
+    replay_messages(messages)
+    trace.finish("ok")
+    # The next question starts a thread that already holds this exchange
+    st.session_state.thread_seed = [{"role": "user", "content": prompt}] + [
+        {"role": "assistant", "content": message["msg"]} for message in messages
+    ]
+
+
+# Only complete answers are cached; a stopped or incomplete one ends mid-sentence
+def run_and_cache(cache, prompt, assistant_id):
+    start = chat_length()
+    started_at = time.monotonic()
+    outcome = run_stream(prompt, None, assistant_id)
+    if outcome == "ok":
+        cache.set(
+            assistant_id,
+            prompt,
+            chat_entries(start, chat_length()),
+            time.monotonic() - started_at,
+        )
+    return outcome
+
+
+def run_starter(starter_key, assistant_id):
+    prompt = STARTER_PROMPTS[starter_key]
+    # The button stands in for the question in the chat, but the context policy needs it
+    append_chat({"name": "user", "msg": prompt, "hidden": True})
+    cacheable = starter_key not in UNCACHED_STARTERS and "thread_id" not in st.session_state
+    if not cacheable:
+        return run_stream(prompt, None, assistant_id)
+
+    cache = get_response_cache()
+    messages = cache.get(assistant_id, prompt)
+    if messages:
+        replay_cached_answer(prompt, messages, assistant_id, "starter_cache")
+        return "ok"
+    return run_and_cache(cache, prompt, assistant_id)
+
+
+# The first question of a conversation can reuse the answer to an earlier one
+# worded differently; later questions depend on the conversation so they run
+def answer_question(question, assistant_id):
+    fresh = "thread_id" not in st.session_state and "thread_seed" not in st.session_state
+    if not fresh or not question_cache_size:
+        return run_stream(question, None, assistant_id)
+
+    cache = get_question_cache()
+    cached = cache.get(assistant_id, question)
+    if cached:
+        messages, matched, score = cached
+        logger.info("answered %r from cached question %r (score %.3f)", question, matched, score)
+        replay_cached_answer(question, messages, assistant_id, "question_cache")
+        return "ok"
+    return run_and_cache(cache, question, assistant_id)
+
+
+def fetch_starter_answer(prompt, assistant_id):
+    started_at = time.monotonic()
+    run = get_client().beta.threads.create_and_run_poll(
+        assistant_id=assistant_id,
+        thread={"messages": [{"role": "user", "content": prompt}]},
+    )
+    try:
+        if run.status != "completed":
+            return None, 0.0
+        messages = get_client().beta.threads.messages.list(
+            thread_id=run.thread_id, run_id=run.id, order="asc"
+        )
+        entries = []
+        for message in messages:
+            for content in message.content:
+                if content.type == "text":
+                    entries.append(
+                        {"name": "assistant", "msg": format_annotation(content.text)}
+                    )
+        return entries, time.monotonic() - started_at
+    finally:
+        get_client().beta.threads.delete(run.thread_id)
+
+
+def warm_response_cache(assistant_id):
+    cache = get_response_cache()
+    for starter_key, prompt in STARTER_PROMPTS.items():
+        if starter_key in UNCACHED_STARTERS:
+            continue
+        entries, run_seconds = fetch_starter_answer(prompt, assistant_id)
+        cache.set(assistant_id, prompt, entries, run_seconds)
+
+
+# ?admin=warm|invalidate|stats&token=... (requires ADMIN_TOKEN)
+def handle_admin_command(assistant_id):
+    command = st.query_params.get("admin")
+    if not command or not admin_token or st.query_params.get("token") != admin_token:
+        return
+    cache = get_response_cache()
+    if command == "warm":
+        with st.spinner("Warming starter cache...", show_time=True):
+            warm_response_cache(assistant_id)
+    elif command == "invalidate":
+        cache.invalidate(assistant_id)
+        get_question_cache().invalidate(assistant_id)
+    st.sidebar.json(cache.stats())
+    st.sidebar.json(get_question_cache().stats())
+    st.sidebar.json(get_tool_executor().stats())
+    st.sidebar.json(get_tool_executor().workers())
+    st.sidebar.json(get_file_cache().stats())
+    st.sidebar.json(get_conversation_store().stats())
+    st.sidebar.json(get_admission_controller().stats())
+    st.sidebar.json(get_startup().report())
+    if event_record_dir:
+        st.sidebar.json(get_event_recorder().stats())
+    if thread_start_mode == "pool":
+        st.sidebar.json(get_warm_thread_pool().stats())
+
+
+# Only the most recent messages are sent on each rerun; older ones load on demand.
+# A window of 0 always renders the whole log.
+@st.fragment
 def render_chat():
-    for chat in st.session_state.chat_log:
+    total = chat_length()
+    window = st.session_state.history_window
+    hidden = max(0, total - window) if window else 0
+    if hidden:
+        step = min(hidden, chat_history_window)
+        if st.button(f"Show {step} earlier messages", key="showEarlierMessages"):
+            st.session_state.history_window += step
+            hidden -= step
+    for chat in chat_entries(hidden, total):
+        if chat.get("hidden"):
+            continue
         with st.chat_message(chat["name"]):
             st.markdown(chat["msg"], True)
 
 
-if "tool_call" not in st.session_state:
-    st.session_state.tool_calls = []
+# chat_log holds the newest session_max_messages entries of the conversation;
+# chat_offset is the position of its first entry in the stored conversation
+def chat_length():
+    return st.session_state.chat_offset + len(st.session_state.chat_log)
+
+
+def chat_entries(start, stop):
+    offset = st.session_state.chat_offset
+    if start >= offset:
+        return st.session_state.chat_log[start - offset:stop - offset]
+    older = get_conversation_store().load(st.session_state.session_id, start, min(stop, offset))
+    return older + st.session_state.chat_log[:max(0, stop - offset)]
 
-if "chat_log" not in st.session_state:
-    st.session_state.chat_log = []
+
+def append_chat(entry):
+    st.session_state.chat_log.append(entry)
+    overflow = len(st.session_state.chat_log) - session_max_messages
+    if overflow > 0:
+        del st.session_state.chat_log[:overflow]
+        st.session_state.chat_offset += overflow
+    try:
+        get_conversation_store().append(st.session_state.session_id, [entry])
+    except Exception:
+        # The entry still shows in this session; only the persisted copy is lost
+        ERRORS_TOTAL.inc(stage="conversation_store")
+        logger.exception("could not persist chat entry for session %s", st.session_state.session_id)
+
+
+def set_thread_id(thread_id):
+    st.session_state.thread_id = thread_id
+    get_conversation_store().set_thread_id(st.session_state.session_id, thread_id)
+
+
+# Picks up a stored conversation by token, or starts a new one without a token.
+# The thread ID comes from the store, so resuming needs no OpenAI request.
+def start_session(token=None):
+    store = get_conversation_store()
+    total = store.count(token) if token else 0
+    st.session_state.session_id = token or new_session_token()
+    st.session_state.chat_offset = max(0, total - session_max_messages)
+    st.session_state.chat_log = store.load(token, st.session_state.chat_offset, total) if total else []
+    st.session_state.history_window = chat_history_window
+    st.session_state.tool_calls = []
+    st.session_state.pop("thread_seed", None)
+    # Messages before context_start are only in the summary; a resumed
+    # conversation rebuilds it on its next turn
+    st.session_state.context_summary = ""
+    st.session_state.context_start = 0
+    thread_id = store.get_thread_id(token) if token else None
+    if thread_id:
+        st.session_state.thread_id = thread_id
+    else:
+        st.session_state.pop("thread_id", None)
+    st.query_params["session"] = st.session_state.session_id
+
+
+def session_token():
+    # ?session=... in the URL, or a cookie set by a fronting proxy or kiosk launcher
+    token = st.query_params.get("session") or st.context.cookies.get(SESSION_COOKIE)
+    if isinstance(token, str) and 0 < len(token) <= 64:
+        return token
+    return None
+
+
+if "session_id" not in st.session_state:
+    start_session(session_token())
 
 if "in_progress" not in st.session_state:
     st.session_state.in_progress = False
@@ -235,222 +1070,176 @@ def disable_form():
     st.session_state.in_progress = True
 
 
+# Pressing Stop interrupts the running script within STOP_POLL_SECONDS and
+# run_stream cancels the run on its way out; by the time this callback runs
+# the cancel below only catches a run that outlived its script
+def stop_run():
+    get_run_registry().cancel(tab_id(), "stopped")
+    st.session_state.in_progress = False
+
+
 def reset_chat():
-    st.session_state.chat_log = []
+    get_run_registry().cancel(tab_id(), "reset")
+    start_session()
     st.session_state.in_progress = False
 
 
-def load_chat_screen(assistant_id, assistant_title):
-    #First set Pertinent CSS
-    css = """
+# Page styles, built once per process. Buttons are styled through the
+# st-key-<key> class Streamlit puts on keyed widgets, so the whole page needs a
+# single <style> element instead of one stylable_container per button.
+@st.cache_data
+def page_css():
+    starter_selectors = ",\n".join(
+        f"        .st-key-{key} button"
+        for key, _, _ in PLAYER_COUNT_STARTERS + ALTERNATE_STARTERS
+    )
+    images = {key: get_asset_pipeline().image(source, 252) for key, source in STARTER_IMAGES.items()}
+    first = next(iter(images.values()))
+    image_selectors = ",\n".join(f"        .st-key-{key} button" for key in images)
+    # The label stays for screen readers
+    label_selectors = ",\n".join(f"        .st-key-{key} button p" for key in images)
+    # Browsers without image-set() type() support keep the PNG
+    image_rules = "\n\n".join(
+        f"""        .st-key-{key} button {{
+            background-image: url("{image.urls['png']}");
+            background-image: image-set(url("{image.urls['webp']}") type("image/webp"), url("{image.urls['png']}") type("image/png"));
+        }}"""
+        for key, image in images.items()
+    )
+    return f"""
     <style>
-        #welcome {
+        #welcome {{
             color: #2A4294;
             font-size: 9vh;
             text-align: center;
-        }
+        }}
 
-        img[data-testid="stLogo"] {
+        img[data-testid="stLogo"] {{
             height: 9vh;
-        }
+        }}
 
-        #instructionContainer {
+        #instructionContainer {{
             color: #141F2B;
             text-align: center;
-        }
+        }}
 
-        #instructionText {
+        #instructionText {{
             font-size: 2vh;
-        }
+        }}
 
-        .st-key-playerCountContainer {
+        .st-key-playerCountContainer {{
             align-text: center;
             justify-content: center;
             background: #E3E8E9;
             border-radius: 15px;
             padding: 10px;
-        }
+        }}
 
-        #underPlayerCountBlurb {
+        #underPlayerCountBlurb {{
             color: #141F2B;
             text-align: center;
-        }
+        }}
 
-        #underPlayerCountBlurbText {
+        #underPlayerCountBlurbText {{
             font-size: 1.5vh;
-        }
+        }}
 
-        #MainMenu {
+        #MainMenu {{
             display: none;
-        }
+        }}
+
+        .st-key-resetButton button {{
+            position: fixed;
+            right: 10px;
+            z-index: 99;
+            background-color: #EC8824;
+            color: #141F2B;
+            border: 2px solid #141F2B;
+        }}
+
+        .st-key-stopButton button {{
+            position: fixed;
+            right: 10px;
+            bottom: 90px;
+            z-index: 99;
+            background-color: #EC8824;
+            color: #141F2B;
+            border: 2px solid #141F2B;
+        }}
+
+{starter_selectors} {{
+            background-color: #BBE4F1;
+            color: #141F2B;
+            border: 2px solid #141F2B;
+        }}
+
+{image_selectors} {{
+            aspect-ratio: {first.width} / {first.height};
+            background-color: transparent;
+            background-position: center;
+            background-repeat: no-repeat;
+            background-size: contain;
+            border: none;
+        }}
+
+{label_selectors} {{
+            clip-path: inset(50%);
+            height: 1px;
+            overflow: hidden;
+            position: absolute;
+            width: 1px;
+        }}
+
+{image_rules}
     </style>
-""" 
-    #Enable CSS
-    st.markdown(css, unsafe_allow_html=True)
+"""
+
+
+# One row of starter buttons; returns the key of the pressed button, if any
+def starter_buttons(container, starters):
+    pressed = None
+    for column, (key, label, _) in zip(container.columns(len(starters)), starters):
+        if column.button(
+            label,
+            key=key,
+            use_container_width=True,
+            on_click=disable_form,
+            disabled=st.session_state.in_progress,
+        ):
+            pressed = key
+    return pressed
+
+
+def load_chat_screen(assistant_id, assistant_title):
+    st.markdown(page_css(), unsafe_allow_html=True)
 
     #Now construct Web Page via HTML
-    st.logo(image='DiversionsLogo.png')
-    with stylable_container("resetButton",
-                                css_styles="""
-                                    button {
-                                        position: fixed;
-                                        right: 10px;
-                                        z-index: 99;
-                                        background-color: #EC8824;
-                                        color: #141F2B;
-                                        border: 2px solid #141F2B;
-                                }""",):
-            resetButton = st.button("Reset", key="resetButton",disabled=st.session_state.in_progress)
+    # st.logo re-encodes anything but PNG and JPEG on every run, so it gets the PNG
+    st.logo(image=get_asset_pipeline().image(LOGO_IMAGE, 256).paths["png"])
+    # Reset stays enabled during a run; pressing it stops the run
+    resetButton = st.button("Reset", key="resetButton")
     st.markdown('<h1 id="welcome">Welcome!</h1>', unsafe_allow_html=True)
     st.markdown('''<div id="instructionContainer"><b><p id="instructionText">I'm Johm.<br>I know the Diversions game library inside and out!<br>Ask me for a recommendation!</p></b></div>''',unsafe_allow_html=True)
     playerCountContainer = st.container(key="playerCountContainer")
-    col1, col2, col3, col4, col5, col6, col7 = playerCountContainer.columns(7)
-    
-    with col1:
-        with stylable_container("playerOne",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerOne = st.button("1 Player", key="playerOne",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-        
-        
-    with col2:
-        with stylable_container("playerTwo",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerTwo = st.button("2 Players", key="playerTwo",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-        # content = f'<a href="#" id="Image 2"><img src="{encodedImage2}" style="width:100%; justify-content:center; background-color:#E3E8E9; cursor: pointer;"></a>'
-        # playerTwo = click_detector(content)
-        
-    with col3:
-        with stylable_container("playerThree",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerThree = st.button("3 Players", key="playerThree",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-        
-    with col4:
-        with stylable_container("playerFour",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerFour = st.button("4 Players", key="playerFour",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-        
-    with col5:
-        with stylable_container("playerFive",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerFive = st.button("5 Players", key="playerFive",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-        
-    with col6:
-        with stylable_container("playerSix",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerSix = st.button("6 Players", key="playerSix",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-        
-    with col7:
-        with stylable_container("playerSeven",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            playerSeven = st.button("7 Players", key="playerSeven",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-                                    
+    pressedStarter = starter_buttons(playerCountContainer, PLAYER_COUNT_STARTERS)
     playerCountContainer.markdown('''<div id="underPlayerCountBlurb"><p id="underPlayerCountBlurbText"><strong>View Top Games by Player Count</strong></p></div>''',unsafe_allow_html=True)
 
     alternateStartersContainer = st.container(key="alternateStartersContainer")
-    altcol1, altcol2, altcol3 = alternateStartersContainer.columns(3)
-    with altcol1:
-        with stylable_container("Teach",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            Teach = st.button("Teach me about board games", key="Teach",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-
-    with altcol2:
-        with stylable_container("Unsure",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            Unsure = st.button("I'm not sure where to start", key="Unsure",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
-
-    with altcol3:
-        with stylable_container("Shuffle",
-                                css_styles="""
-                                    button {
-                                    background-color: #BBE4F1;
-                                    color: #141F2B;
-                                    border: 2px solid #141F2B;
-                                }""",):
-            Shuffle = st.button("Shuffle and deal me", key="Shuffle",use_container_width=True,on_click=disable_form,disabled=st.session_state.in_progress)
+    pressedStarter = starter_buttons(alternateStartersContainer, ALTERNATE_STARTERS) or pressedStarter
 
     if resetButton:
-        st.session_state.in_progress = False
-        st.session_state.chat_log = []
-        try:
-            del st.session_state['thread']
-        except:
-            pass
-        render_chat()
-        
-    buttonAutoMessage = None
-    
-    if playerOne:
-        buttonAutoMessage = "What are some of your top rated games for only 1 player; especially if the best player count is 1?"
-    elif playerTwo:
-        buttonAutoMessage = "What are some of your top rated games for only 2 players; especially if the best player count is 2?"
-    elif playerThree:
-        buttonAutoMessage = "What are some of your top rated games for 3 players; especially if the best player count is 3?"
-    elif playerFour:
-        buttonAutoMessage = "What are some of your top rated games for 4 players; especially if the best player count is 4?"
-    elif playerFive:
-        buttonAutoMessage = "What are some of your top rated games for 5 players; especially if the best player count is 5?"
-    elif playerSix:
-        buttonAutoMessage = "What are some of your top rated games for 6 players; especially if the best player count is 6?"
-    elif playerSeven:
-        buttonAutoMessage = "What are some of your top rated games for 7 or more players; especially if the best player count is 7 or more?"
-    elif Teach:
-        buttonAutoMessage = "I'm not super familiar with board game terminology, so I'm not sure how to ask you for recommendations. Could you tell me a bit about a few types of board games?"
-    elif Unsure:
-        buttonAutoMessage = "I'm a bit unsure how to start because I'm a bit new to board games. Could you help me figure out how where to start?"
-    elif Shuffle:
-        buttonAutoMessage = "Surprise me! With equal odds for every game in the library, could you randomly pick 5 games and give them to me?"
-    if buttonAutoMessage:
+        reset_chat()
+
+    if pressedStarter:
         with st.spinner("Now searching our entire board game library...", show_time=True):
+            st.button("Stop", key="stopButton", on_click=stop_run)
             render_chat()
-            if not run_stream(buttonAutoMessage, None, assistant_id):
-                st.session_state.chat_log.append({"name": "assistant","msg":"Apologies, I experienced an error trying to process your request. It seems like it was a momentary outage. Please refresh the page and ask again; I'll do my best not to break again!"})
-            st.session_state.in_progress = False
-            st.session_state.tool_call = None
+            try:
+                if run_starter(pressedStarter, assistant_id) == "error":
+                    append_chat({"name": "assistant","msg":"Apologies, I experienced an error trying to process your request. It seems like it was a momentary outage. Please refresh the page and ask again; I'll do my best not to break again!"})
+            finally:
+                st.session_state.in_progress = False
+                st.session_state.tool_calls = []
             st.rerun()
     user_msg = st.chat_input(
         placeholder="Ask a custom question", accept_file=False,on_submit=disable_form, disabled=st.session_state.in_progress
@@ -460,21 +1249,35 @@ def load_chat_screen(assistant_id, assistant_title):
             render_chat()
             with st.chat_message("user"):
                 st.markdown(user_msg, True)
-            st.session_state.chat_log.append({"name": "user", "msg": user_msg})
+            append_chat({"name": "user", "msg": user_msg})
+            st.button("Stop", key="stopButton", on_click=stop_run)
     
-            if not run_stream(user_msg, None, assistant_id):
-                st.session_state.chat_log.append({"name": "assistant","msg":"Apologies, I experienced an error trying to process your request. It seems like it was a momentary outage. Please refresh the page and ask again; I'll do my best not to break again!"})
-            st.session_state.in_progress = False
-            st.session_state.tool_call = None
+            try:
+                if answer_question(user_msg, assistant_id) == "error":
+                    append_chat({"name": "assistant","msg":"Apologies, I experienced an error trying to process your request. It seems like it was a momentary outage. Please refresh the page and ask again; I'll do my best not to break again!"})
+            finally:
+                st.session_state.in_progress = False
+                st.session_state.tool_calls = []
             st.rerun()
 
     render_chat()
         
 def main():
-    single_agent_id = os.environ.get("ASSISTANT_ID", None)
-    single_agent_title = os.environ.get("ASSISTANT_TITLE", "Assistants API UI")
+    started_at = time.monotonic()
+    start_metrics_export()
+    startup = get_startup()
+    if thread_start_mode == "pool":
+        get_warm_thread_pool()
 
-    load_chat_screen(single_agent_id, single_agent_title)
+    try:
+        handle_admin_command(single_agent_id)
+        # A bad ID or key fails every run, so say so up front
+        if startup.problem(single_agent_id):
+            st.error("This assistant is not available right now. Please try again later.")
+            return
+        load_chat_screen(single_agent_id, single_agent_title)
+    finally:
+        SCRIPT_RUN_SECONDS.observe(time.monotonic() - started_at)
     
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+# Measures what the chat screen costs a browser: websocket bytes for the first
+# load and for each rerun, the images it then fetches, and how long the first
+# load takes until the script has finished and every image has arrived.
+#
+#   python benchmarks/asset_benchmark.py [--revision HEAD~1] [--loads 5]
+#
+# Images are collected from the logo message and the url()s in the page
+# styles; where an image-set offers WebP the WebP file is fetched, as a current
+# browser would. "repeat KB" is what a second visit downloads again: images
+# without a max-age are revalidated and counted in full, which is what a
+# browser pays after its heuristic freshness runs out. The "inline" row is the
+# base64 data URIs the player count images would add to every rerun if they
+# were inlined instead.
+import argparse
+import asyncio
+import base64
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from types import SimpleNamespace
+
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import ROOT, HeadlessSession, start_processes  # noqa: E402
+
+CSS_URL = re.compile(r'url\("([^"]+)"\)')
+PLAYER_IMAGES = [os.path.join(ROOT, "assets", f"{number}.png") for number in range(1, 8)]
+
+
+class PageSession(HeadlessSession):
+    # Returns (websocket bytes, image URLs) for one script run
+    async def load(self, first=False):
+        if first:
+            await self.connect()
+        await self.rerun()
+        size = 0
+        urls = []
+        while True:
+            payload = await asyncio.wait_for(self.ws.read_message(), self.timeout)
+            if payload is None:
+                raise ConnectionError("websocket closed")
+            size += len(payload)
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            kind = msg.WhichOneof("type")
+            if kind == "logo" and msg.logo.image:
+                urls.append(msg.logo.image)
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                if element.WhichOneof("type") == "markdown" and "<style>" in element.markdown.body:
+                    urls.extend(CSS_URL.findall(element.markdown.body))
+            elif kind == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return size, urls
+
+
+def browser_choice(urls):
+    # One file per image: the WebP where a WebP sibling exists
+    chosen = {}
+    for url in dict.fromkeys(urls):
+        stem, ext = os.path.splitext(url.split("?")[0])
+        if ext != ".png" or stem not in chosen:
+            chosen[stem] = url
+    return list(chosen.values())
+
+
+def fetch(base, url):
+    full = url if url.startswith("http") else f"{base}/{url.lstrip('/')}"
+    with urllib.request.urlopen(full) as response:
+        body = response.read()
+        cache_control = response.headers.get("Cache-Control") or ""
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return len(body), int(match.group(1)) if match else 0
+
+
+async def visit(args, base):
+    session = PageSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", "", args.timeout)
+    start = time.monotonic()
+    ws_bytes, urls = await session.load(first=True)
+    images = await asyncio.gather(*(asyncio.to_thread(fetch, base, url) for url in browser_choice(urls)))
+    first_load = time.monotonic() - start
+    rerun_bytes, _ = await session.load()
+    session.ws.close()
+    return ws_bytes, images, first_load, rerun_bytes
+
+
+def measure(args, script):
+    mock, app = start_processes(args, script)
+    base = f"http://127.0.0.1:{args.app_port}"
+    try:
+        visits = [asyncio.run(visit(args, base)) for _ in range(args.loads)]
+    finally:
+        app.terminate()
+        mock.terminate()
+        app.wait()
+        mock.wait()
+    ws_bytes, images, _, rerun_bytes = visits[-1]
+    image_bytes = sum(size for size, _ in images)
+    repeat_bytes = ws_bytes + sum(size for size, max_age in images if not max_age)
+    return {
+        "ws": ws_bytes,
+        "images": len(images),
+        "image_bytes": image_bytes,
+        "repeat": repeat_bytes,
+        "rerun": rerun_bytes,
+        "first_load": statistics.median(visit[2] for visit in visits),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--revision", help="also measure app.py as of this git revision")
+    parser.add_argument("--loads", type=int, default=5, help="First loads to take the median of")
+    parser.add_argument("--app-port", type=int, default=8596)
+    parser.add_argument("--mock-port", type=int, default=8762)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    settings = SimpleNamespace(
+        app_port=args.app_port,
+        mock_port=args.mock_port,
+        loads=args.loads,
+        timeout=args.timeout,
+        tokens_per_second=60.0,
+        answer_tokens=10,
+        tool_call_rate=0.0,
+        failure_rate=0.0,
+        drop_rate=0.0,
+        run_failure_rate=0.0,
+        api_latency=0.05,
+        queue_seconds=0.2,
+        max_active_runs=0,
+        prefill_tokens_per_second=0.0,
+        env=["CONVERSATION_STORE=memory"],
+    )
+
+    apps = [("current", "app.py")]
+    if args.revision:
+        source = subprocess.run(
+            ["git", "show", f"{args.revision}:app.py"], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        baseline = os.path.join(ROOT, ".asset_benchmark_app.py")
+        with open(baseline, "w") as f:
+            f.write(source)
+        apps.insert(0, (args.revision, os.path.basename(baseline)))
+
+    print(f"{'app':>10}{'ws KB':>8}{'images':>8}{'image KB':>10}{'total KB':>10}{'repeat KB':>11}{'rerun KB':>10}{'load ms':>9}")
+    try:
+        for name, script in apps:
+            r = measure(settings, script)
+            print(
+                f"{name:>10}{r['ws'] / 1024:>8.1f}{r['images']:>8}{r['image_bytes'] / 1024:>10.1f}"
+                f"{(r['ws'] + r['image_bytes']) / 1024:>10.1f}{r['repeat'] / 1024:>11.1f}"
+                f"{r['rerun'] / 1024:>10.1f}{r['first_load'] * 1000:>9.0f}",
+                flush=True,
+            )
+    finally:
+        if args.revision:
+            os.remove(baseline)
+    inline = 0
+    for path in PLAYER_IMAGES:
+        with open(path, "rb") as f:
+            inline += len("data:image/png;base64,") + len(base64.b64encode(f.read()))
+    print(f"{'inline':>10}  player count images as data URIs add {inline / 1024:.1f} KB to every load and rerun")
+
+
+if __name__ == "__main__":
+    main()
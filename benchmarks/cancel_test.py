@@ -0,0 +1,272 @@
+# Checks that a run is cancelled and its script thread released within a bounded
+# time when the user presses Stop (while the answer streams or while a tool
+# runs), closes the tab, or the run stalls, and that a second tab on the same
+# conversation leaves the first tab's run alone.
+#
+#   python benchmarks/cancel_test.py [--bound 5]
+#
+# Uses the same mock API and headless websocket sessions as load_test.py. Each
+# scenario reports how long after the trigger the app finished the script (or
+# the mock saw the cancel, for a closed tab) and the run's status on the mock.
+#
+# Streamlit starts the run for a Stop click at once even while the old script
+# is blocked, so the tool case times something else: how long the interrupted
+# turn takes to give back its run slot (assistant_admission_running on
+# METRICS_PORT). GAME_LIBRARY_PATH points at a named pipe nobody writes to, so
+# find_games blocks until the pipe is released after the scenario.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+from types import SimpleNamespace
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import HeadlessSession, start_processes  # noqa: E402
+
+CANCELLED_STATUSES = {"cancelling", "cancelled"}
+
+
+def mock_runs(args):
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.mock_port}/__stats") as response:
+        return json.load(response)["runs"]
+
+
+def running_turns(args):
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.metrics_port}/metrics") as response:
+        lines = response.read().decode().splitlines()
+    return sum(float(line.split()[-1]) for line in lines if line.startswith("assistant_admission_running{"))
+
+
+async def wait_for_release(args, deadline):
+    while time.monotonic() < deadline:
+        if not await asyncio.to_thread(running_turns, args):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def wait_for_cancel(args, deadline):
+    while time.monotonic() < deadline:
+        runs = await asyncio.to_thread(mock_runs, args)
+        if runs and runs[-1]["status"] in CANCELLED_STATUSES:
+            return runs[-1]["status"]
+        await asyncio.sleep(0.05)
+    return mock_runs(args)[-1]["status"] if mock_runs(args) else None
+
+
+class CancelSession(HeadlessSession):
+    async def start_turn(self, question):
+        await self.connect()
+        await self.rerun()
+        await self.read_until_finished()
+        widget = BackMsg().rerun_script.widget_states.widgets.add()
+        widget.id = self.chat_input_id
+        widget.chat_input_value.data = question
+        await self.rerun([widget])
+
+    async def read_until(self, predicate):
+        while True:
+            payload = await asyncio.wait_for(self.ws.read_message(), self.timeout)
+            if payload is None:
+                raise ConnectionError("websocket closed")
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            if predicate(msg):
+                return msg
+
+    async def read_until_streaming(self):
+        stop_id = None
+
+        def streaming(msg):
+            nonlocal stop_id
+            if msg.WhichOneof("type") != "delta" or msg.delta.WhichOneof("type") != "new_element":
+                return False
+            element = msg.delta.new_element
+            if element.WhichOneof("type") == "button" and "stopButton" in element.button.id:
+                stop_id = element.button.id
+            return element.WhichOneof("type") == "markdown" and self.marker in element.markdown.body
+
+        await self.read_until(streaming)
+        return stop_id
+
+
+def release_library(path):
+    # Opening the write end and closing it gives every blocked reader end of file
+    try:
+        os.close(os.open(path, os.O_WRONLY | os.O_NONBLOCK))
+    except OSError:
+        pass
+
+
+async def press(session, button_id):
+    widget = BackMsg().rerun_script.widget_states.widgets.add()
+    widget.id = button_id
+    widget.trigger_value = True
+    await session.rerun([widget])
+
+
+async def scenario_stop(args):
+    session = CancelSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", args.marker, args.timeout)
+    await session.start_turn("What are good games for 4 players?")
+    stop_id = await session.read_until_streaming()
+    start = time.monotonic()
+    await press(session, stop_id)
+    # The interrupted turn, then the run started by the Stop click
+    await session.read_until_finished()
+    seconds = time.monotonic() - start
+    status = await wait_for_cancel(args, time.monotonic() + args.bound)
+    session.ws.close()
+    return seconds, status
+
+
+async def scenario_stop_in_tool(args):
+    session = CancelSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", "### Function Calling", args.timeout)
+    try:
+        await session.start_turn("Which games can 4 of us play?")
+        stop_id = await session.read_until_streaming()
+        start = time.monotonic()
+        await press(session, stop_id)
+        released = await wait_for_release(args, start + args.bound)
+        seconds = time.monotonic() - start if released else float("inf")
+        status = await wait_for_cancel(args, time.monotonic() + args.bound)
+        session.ws.close()
+        return seconds, status
+    finally:
+        release_library(args.library)
+
+
+async def scenario_close_tab(args):
+    session = CancelSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", args.marker, args.timeout)
+    await session.start_turn("What are good games for 2 players?")
+    await session.read_until_streaming()
+    start = time.monotonic()
+    session.ws.close()
+    status = await wait_for_cancel(args, start + args.bound)
+    return time.monotonic() - start, status
+
+
+async def scenario_shared_tabs(args):
+    # Both tabs open the same conversation, as two devices with one ?session= link would
+    url = f"ws://127.0.0.1:{args.app_port}/_stcore/stream"
+    first = CancelSession(url, args.marker, args.timeout, "session=shared-conversation")
+    second = CancelSession(url, args.marker, args.timeout, "session=shared-conversation")
+    await first.start_turn("What are good games for 3 players?")
+    await first.read_until_streaming()
+    start = time.monotonic()
+    await second.start_turn("What are good games for 6 players?")
+    stop_id = await second.read_until_streaming()
+    await press(second, stop_id)
+    await second.read_until_finished()
+    seconds = time.monotonic() - start
+    # The first tab's run must still be streaming
+    status = (await asyncio.to_thread(mock_runs, args))[0]["status"]
+    first.ws.close()
+    second.ws.close()
+    return seconds, status
+
+
+async def scenario_stall(args):
+    session = CancelSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", args.marker, args.timeout)
+    start = time.monotonic()
+    await session.start_turn("What are good games for 5 players?")
+    await session.read_until_finished()
+    seconds = time.monotonic() - start
+    status = await wait_for_cancel(args, time.monotonic() + args.bound)
+    session.ws.close()
+    return seconds, status
+
+
+def settings(args, **overrides):
+    values = dict(
+        app_port=args.app_port,
+        mock_port=args.mock_port,
+        metrics_port=args.metrics_port,
+        marker=args.marker,
+        timeout=args.timeout,
+        bound=args.bound,
+        tokens_per_second=20.0,
+        answer_tokens=2000,
+        tool_call_rate=0.0,
+        failure_rate=0.0,
+        drop_rate=0.0,
+        run_failure_rate=0.0,
+        api_latency=0.05,
+        queue_seconds=0.2,
+        max_active_runs=0,
+        prefill_tokens_per_second=0.0,
+        env=[f"RUN_IDLE_SECONDS={args.idle_seconds}", "CONVERSATION_STORE=memory"],
+        mock_args=(),
+    )
+    env = overrides.pop("env", [])
+    values.update(overrides)
+    values["env"] = values["env"] + env
+    return SimpleNamespace(**values)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-port", type=int, default=8598)
+    parser.add_argument("--mock-port", type=int, default=8764)
+    parser.add_argument("--metrics-port", type=int, default=9468)
+    parser.add_argument("--marker", default="**Game")
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    parser.add_argument("--bound", type=float, default=5.0, help="Longest acceptable time to free the run")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    library = os.path.join(tmp.name, "games.csv")
+    os.mkfifo(library)
+    # name, settings, scenario, extra seconds allowed, mock statuses that pass
+    scenarios = [
+        ("stop", settings(args), scenario_stop, 0, CANCELLED_STATUSES),
+        (
+            "stop in tool",
+            settings(
+                args,
+                tool_call_rate=1.0,
+                library=library,
+                env=[
+                    f"GAME_LIBRARY_PATH={library}",
+                    f"METRICS_PORT={args.metrics_port}",
+                    "TOOL_TIMEOUT_SECONDS=120",
+                ],
+                mock_args=["--tool-name", "find_games", "--tool-arguments", json.dumps({"players": 4})],
+            ),
+            scenario_stop_in_tool,
+            0,
+            CANCELLED_STATUSES,
+        ),
+        ("close tab", settings(args), scenario_close_tab, 0, CANCELLED_STATUSES),
+        # The mock holds the run in the queue, so only the idle reaper can end it
+        ("stall", settings(args, queue_seconds=60.0), scenario_stall, args.idle_seconds, CANCELLED_STATUSES),
+        ("two tabs", settings(args), scenario_shared_tabs, args.timeout, {"in_progress"}),
+    ]
+    failures = 0
+    print(f"{'scenario':>12}{'seconds':>10}{'mock status':>14}")
+    for name, setting, scenario, allowance, passing in scenarios:
+        mock, app = start_processes(setting, mock_args=setting.mock_args)
+        try:
+            seconds, status = asyncio.run(scenario(setting))
+        finally:
+            app.terminate()
+            mock.terminate()
+            app.wait()
+            mock.wait()
+        ok = status in passing and seconds <= args.bound + allowance
+        failures += not ok
+        print(f"{name:>12}{seconds:>10.2f}{status or '-':>14}{'' if ok else '  FAILED'}", flush=True)
+    tmp.cleanup()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Holds one long conversation per CONTEXT_MODE against the mock API and reports
+# the prompt tokens and latency the app logged for each turn, to check that
+# bounded modes stay flat as the thread grows.
+#
+#   python benchmarks/context_benchmark.py [--turns 50] [--modes full summarize fresh]
+#
+# The mock reads the prompt at --prefill-tokens-per-second before the first
+# delta, so a run over a longer thread starts later, as it does on the API.
+# Prompt tokens and timings come from the app's TRACE_LOG_PATH records.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import ERROR_TEXT, HeadlessSession, start_processes  # noqa: E402
+
+REPORT_TURNS = (1, 5, 10, 20, 30, 40, 50)
+
+
+def question(turn):
+    return f"Turn {turn}: which games for {turn % 6 + 1} players play in under {15 * (turn % 8 + 1)} minutes?"
+
+
+class ConversationSession(HeadlessSession):
+    async def open(self):
+        await self.connect()
+        await self.rerun()
+        await self.read_until_finished()
+
+    # Returns False when the app showed its error message for the turn
+    async def ask(self, text):
+        failed = False
+
+        def on_delta(element):
+            nonlocal failed
+            if element.WhichOneof("type") == "markdown" and ERROR_TEXT in element.markdown.body:
+                failed = True
+
+        widget = BackMsg().rerun_script.widget_states.widgets.add()
+        widget.id = self.chat_input_id
+        widget.chat_input_value.data = text
+        await self.rerun([widget])
+        await self.read_until_finished(on_delta)
+        return not failed
+
+
+async def converse(args):
+    session = ConversationSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", args.marker, args.timeout)
+    await session.open()
+    failures = 0
+    for turn in range(1, args.turns + 1):
+        failures += not await session.ask(question(turn))
+    session.ws.close()
+    return failures
+
+
+def settings(args, mode, trace_path):
+    return SimpleNamespace(
+        app_port=args.app_port,
+        mock_port=args.mock_port,
+        marker=args.marker,
+        timeout=args.timeout,
+        turns=args.turns,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        tool_call_rate=0.0,
+        failure_rate=0.0,
+        drop_rate=0.0,
+        run_failure_rate=0.0,
+        api_latency=0.05,
+        queue_seconds=0.1,
+        max_active_runs=0,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        env=[f"CONTEXT_MODE={mode}", f"TRACE_LOG_PATH={trace_path}", "CONVERSATION_STORE=memory"] + args.env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", default=["full", "truncate", "summarize", "fresh"])
+    parser.add_argument("--answer-tokens", type=int, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=1000.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=5000.0)
+    parser.add_argument("--env", action="append", default=[], help="Extra app setting, e.g. --env CONTEXT_LAST_MESSAGES=6")
+    parser.add_argument("--app-port", type=int, default=8597)
+    parser.add_argument("--mock-port", type=int, default=8763)
+    parser.add_argument("--marker", default="**Game")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    turns = [turn for turn in REPORT_TURNS if turn <= args.turns]
+    print(f"{'mode':>10}{'turn':>6}{'prompt tok':>12}{'ttft s':>9}{'turn s':>9}")
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = os.path.join(tmp, "traces.jsonl")
+            setting = settings(args, mode, trace_path)
+            mock, app = start_processes(setting)
+            try:
+                failures = asyncio.run(converse(setting))
+            finally:
+                app.terminate()
+                mock.terminate()
+                app.wait()
+                mock.wait()
+            with open(trace_path) as f:
+                records = [json.loads(line) for line in f]
+        for turn in turns:
+            record = records[turn - 1]
+            print(
+                f"{mode:>10}{turn:>6}{record['prompt_tokens'] or 0:>12}"
+                f"{record['marks'].get('first_delta', 0):>9.2f}{record['total_seconds']:>9.2f}"
+            )
+        if failures:
+            print(f"{mode:>10}  {failures} failed turns")
+        print(flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Builds a synthetic game library, loads it into GameCatalog and times the
+# tool queries against a plain scan over the parsed rows. Every indexed answer
+# is checked against the scan.
+#
+#   python benchmarks/game_catalog_benchmark.py [--games 50000] [--repeat 2000]
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_catalog import GameCatalog, read_rows  # noqa: E402
+
+QUERIES = [
+    ("2 players", {"players": 2}),
+    ("best at 1", {"best_players": 1}),
+    ("best at 7", {"players": 7, "best_players": 7}),
+    ("4p, light, short", {"players": 4, "max_weight": 2.0, "max_play_time": 45}),
+    ("rating >= 8.5", {"min_rating": 8.5}),
+    ("heavy, 3p", {"players": 3, "min_weight": 4.2}),
+    ("under 15 min", {"max_play_time": 15}),
+]
+
+
+def write_library(path, count, seed=7):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "min_players", "max_players", "best_players", "rating", "weight", "play_time"])
+        for i in range(count):
+            low = rng.choice([1, 1, 2, 2, 2, 3, 4])
+            high = max(low, rng.choice([2, 4, 4, 5, 6, 8, 10]))
+            best = ",".join(str(n) for n in sorted(rng.sample(range(low, high + 1), min(2, high - low + 1))))
+            writer.writerow([
+                f"Game {i}",
+                low,
+                high,
+                best,
+                round(rng.uniform(4, 9.5), 2),
+                round(rng.uniform(1, 5), 2),
+                rng.choice([10, 15, 20, 30, 45, 60, 90, 120, 180, 240]),
+            ])
+
+
+def scan(rows, players=None, best_players=None, min_rating=None, min_weight=None, max_weight=None, max_play_time=None, limit=10):
+    found = []
+    for row in rows:
+        if players is not None and not int(row["min_players"]) <= players <= int(row["max_players"]):
+            continue
+        if best_players is not None and str(best_players) not in row["best_players"].split(","):
+            continue
+        if min_rating is not None and float(row["rating"]) < min_rating:
+            continue
+        if min_weight is not None and float(row["weight"]) < min_weight:
+            continue
+        if max_weight is not None and float(row["weight"]) > max_weight:
+            continue
+        if max_play_time is not None and int(row["play_time"]) > max_play_time:
+            continue
+        found.append(row)
+    found.sort(key=lambda row: -float(row["rating"]))
+    return [round(float(row["rating"]), 2) for row in found[:limit]]
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "games.csv")
+        write_library(path, args.games)
+        start = time.perf_counter()
+        catalog = GameCatalog.load(path)
+        load_seconds = time.perf_counter() - start
+        rows = read_rows(path)
+
+    print(f"loaded {len(catalog)} games in {load_seconds * 1000:.0f} ms")
+    print(f"{'query':>18}{'index us':>12}{'scan ms':>10}")
+    for name, query in QUERIES:
+        games, _ = catalog.find(**query)
+        expected = scan(rows, **query)
+        # Games with equal ratings may come back in either order, so compare ratings
+        assert [game["rating"] for game in games] == expected, name
+        indexed = timed(lambda: catalog.find(**query), args.repeat)
+        scanned = timed(lambda: scan(rows, **query), 3)
+        print(f"{name:>18}{indexed * 1e6:>12.1f}{scanned * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Measures script rerun time and chat-history payload for growing chat logs.
+#
+#   python benchmarks/history_benchmark.py [--sizes 10 100 500] [--window 20]
+#
+# "full" renders every message on each rerun (CHAT_HISTORY_WINDOW=0), "windowed"
+# uses the configured window. Payload counts the markdown bytes of chat messages.
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from conversation_store import SQLiteConversationStore, new_session_token  # noqa: E402
+
+# The app reads the seeded conversations back through ?session=<token>
+STORE_PATH = os.path.join(tempfile.mkdtemp(), "conversations.db")
+os.environ["CONVERSATION_STORE"] = f"sqlite:///{STORE_PATH}"
+
+
+def make_chat_log(size):
+    chat_log = []
+    for i in range(size):
+        if i % 2 == 0:
+            chat_log.append({"name": "user", "msg": f"What are good games for {i % 7 + 1} players?"})
+        else:
+            games = "\n".join(
+                f"{n}. **Game {i}-{n}** - a medium weight strategy game with great replayability."
+                for n in range(1, 11)
+            )
+            chat_log.append({"name": "assistant", "msg": f"Here are some picks:\n{games}"})
+    return chat_log
+
+
+def measure(size, window, reruns):
+    os.environ["CHAT_HISTORY_WINDOW"] = str(window)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    session = new_session_token()
+    SQLiteConversationStore(STORE_PATH).append(session, make_chat_log(size))
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.query_params["session"] = session
+    at.run()
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    payload = sum(
+        len(markdown.value.encode())
+        for message in at.chat_message
+        for markdown in message.markdown
+    )
+    return statistics.median(timings), payload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    print(f"{'messages':>10}{'mode':>10}{'rerun ms':>12}{'payload KB':>12}")
+    for size in args.sizes:
+        for mode, window in (("full", 0), ("windowed", args.window)):
+            seconds, payload = measure(size, window, args.reruns)
+            print(f"{size:>10}{mode:>10}{seconds * 1000:>12.1f}{payload / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# Drives N concurrent headless Streamlit sessions against the local mock API
+# and reports latency and server load per session count.
+#
+#   python benchmarks/load_test.py --sessions 1 5 10 25 50 --tokens-per-second 60
+#
+# The harness starts the mock API and `streamlit run app.py`, then opens one
+# websocket per session and speaks the same protocol as the browser: load the
+# page, submit a question through st.chat_input, wait for the answer and the
+# rerun that follows, then rerun once more. Server CPU and RSS are read from
+# /proc for the Streamlit process.
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ERROR_TEXT = "Apologies, I experienced an error"
+
+
+def process_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def process_rss_megabytes(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_for_http(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start_processes(args, script="app.py", mock_args=()):
+    mock = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT, "benchmarks", "mock_api.py"),
+            "--port", str(args.mock_port),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--answer-tokens", str(args.answer_tokens),
+            "--tool-call-rate", str(args.tool_call_rate),
+            "--failure-rate", str(args.failure_rate),
+            "--drop-rate", str(args.drop_rate),
+            "--run-failure-rate", str(args.run_failure_rate),
+            "--api-latency", str(args.api_latency),
+            "--queue-seconds", str(args.queue_seconds),
+            "--max-active-runs", str(args.max_active_runs),
+            "--prefill-tokens-per-second", str(args.prefill_tokens_per_second),
+            *mock_args,
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{args.mock_port}/v1",
+        OPENAI_API_KEY="mock",
+        ASSISTANT_ID="asst_mock",
+        # Sessions repeat a few questions; measure runs, not question cache hits
+        QUESTION_CACHE_SIZE="0",
+    )
+    env.update(setting.split("=", 1) for setting in args.env)
+    app = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", script,
+            "--server.headless", "true",
+            "--server.port", str(args.app_port),
+            "--browser.gatherUsageStats", "false",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_for_http(f"http://127.0.0.1:{args.mock_port}/__stats")
+    wait_for_http(f"http://127.0.0.1:{args.app_port}/_stcore/health")
+    return mock, app
+
+
+class HeadlessSession:
+    def __init__(self, url, marker, timeout, query_string=""):
+        self.url = url
+        self.query_string = query_string
+        self.marker = marker
+        self.timeout = timeout
+        self.chat_input_id = None
+
+    async def connect(self):
+        self.ws = await websocket_connect(self.url, subprotocols=["streamlit"])
+
+    async def rerun(self, widgets=()):
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        msg.rerun_script.page_script_hash = ""
+        for widget in widgets:
+            msg.rerun_script.widget_states.widgets.append(widget)
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+    async def read_until_finished(self, on_delta=None):
+        # A turn ends with st.rerun(), so wait for a run that is not cut short
+        while True:
+            payload = await asyncio.wait_for(self.ws.read_message(), self.timeout)
+            if payload is None:
+                raise ConnectionError("websocket closed")
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            kind = msg.WhichOneof("type")
+            if kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                if element.WhichOneof("type") == "chat_input":
+                    self.chat_input_id = element.chat_input.id
+                if on_delta is not None:
+                    on_delta(element)
+            elif kind == "script_finished":
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    async def run(self, question):
+        result = {"failed": False}
+        await self.connect()
+        start = time.monotonic()
+        await self.rerun()
+        await self.read_until_finished()
+        result["load_seconds"] = time.monotonic() - start
+
+        widget = BackMsg().rerun_script.widget_states.widgets.add()
+        widget.id = self.chat_input_id
+        widget.chat_input_value.data = question
+        first_token_at = None
+        last_token_at = None
+        updates = 0
+
+        def on_delta(element):
+            nonlocal first_token_at, last_token_at, updates
+            if element.WhichOneof("type") != "markdown":
+                return
+            body = element.markdown.body
+            if ERROR_TEXT in body:
+                result["failed"] = True
+            elif self.marker in body:
+                last_token_at = time.monotonic()
+                first_token_at = first_token_at or last_token_at
+                updates += 1
+
+        start = time.monotonic()
+        await self.rerun([widget])
+        await self.read_until_finished(on_delta)
+        result["turn_seconds"] = time.monotonic() - start
+        result["ttft_seconds"] = first_token_at - start if first_token_at else None
+        result["stream_seconds"] = last_token_at - first_token_at if first_token_at else None
+        result["updates"] = updates
+
+        start = time.monotonic()
+        await self.rerun()
+        await self.read_until_finished()
+        result["rerun_seconds"] = time.monotonic() - start
+        self.ws.close()
+        return result
+
+
+async def run_session(args, index):
+    session = HeadlessSession(
+        f"ws://127.0.0.1:{args.app_port}/_stcore/stream", args.marker, args.timeout
+    )
+    try:
+        return await session.run(f"What are good games for {index % 7 + 1} players?")
+    except Exception as e:
+        return {"failed": True, "error": repr(e)}
+
+
+def percentile(values, fraction):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--app-port", type=int, default=8599)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=300)
+    parser.add_argument("--tool-call-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--run-failure-rate", type=float, default=0.0)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Mock latency per API round trip")
+    parser.add_argument("--queue-seconds", type=float, default=0.2, help="Mock time a run stays queued")
+    parser.add_argument("--max-active-runs", type=int, default=0, help="Mock answers 429 to runs beyond this many")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0, help="Mock time to read the prompt")
+    parser.add_argument("--env", action="append", default=[], help="Extra app setting, e.g. --env THREAD_START_MODE=pool")
+    parser.add_argument("--marker", default="**Game", help="Text that identifies streamed answer markdown")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    mock, app = start_processes(args)
+    print(
+        f"{'sessions':>8}{'ttft p50':>10}{'ttft p95':>10}{'tok/s':>8}{'turn p95':>10}"
+        f"{'rerun p50':>11}{'fail':>6}{'cpu s/sess':>12}{'rss MB':>8}"
+    )
+    try:
+        for sessions in args.sessions:
+            cpu_start = process_cpu_seconds(app.pid)
+
+            async def run_all():
+                return await asyncio.gather(*(run_session(args, i) for i in range(sessions)))
+
+            results = asyncio.run(run_all())
+            cpu_seconds = process_cpu_seconds(app.pid) - cpu_start
+            ok = [r for r in results if not r["failed"]]
+            rates = [
+                args.answer_tokens / r["stream_seconds"]
+                for r in ok
+                if r.get("stream_seconds")
+            ]
+            print(
+                f"{sessions:>8}"
+                f"{percentile([r['ttft_seconds'] for r in ok], 0.5):>10.2f}"
+                f"{percentile([r['ttft_seconds'] for r in ok], 0.95):>10.2f}"
+                f"{statistics.mean(rates) if rates else 0:>8.1f}"
+                f"{percentile([r['turn_seconds'] for r in ok], 0.95):>10.2f}"
+                f"{percentile([r['rerun_seconds'] for r in ok], 0.5):>11.3f}"
+                f"{len(results) - len(ok):>6}"
+                f"{cpu_seconds / sessions:>12.3f}"
+                f"{process_rss_megabytes(app.pid):>8.0f}",
+                flush=True,
+            )
+            for r in results:
+                if "error" in r:
+                    print(f"  session error: {r['error']}")
+    finally:
+        app.terminate()
+        mock.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,728 @@
+# Local stand-in for the parts of the Assistants API the app uses: assistants,
+# threads, messages, streamed runs, submit_tool_outputs, cancel and file content.
+#
+#   python benchmarks/mock_api.py --port 8765 --tokens-per-second 60 --tool-call-rate 0.2
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock ASSISTANT_ID=asst_mock streamlit run app.py
+#
+# --drop-rate resets the connection halfway through an answer while the run
+# finishes server side; --run-failure-rate ends runs with a server_error.
+# --max-active-runs answers 429 rate_limit_exceeded to new runs while that many
+# are still going, like an organization at its rate limit.
+#
+# Runs report usage. Prompt tokens count the thread messages the run reads,
+# after truncation_strategy and max_prompt_tokens, at about four characters a
+# token; --prefill-tokens-per-second makes the first delta wait for them.
+# max_completion_tokens cuts the answer short and ends the run incomplete.
+#
+# --code-interpreter-rate streams a code interpreter step (input, then logs)
+# before the answer.
+#
+# --replay serves a turn recorded with EVENT_RECORD_DIR instead: each streamed
+# run or tool output submission gets the recording's next stream, at the
+# recorded pace (--replay-speed 2 doubles it, 0 sends it all at once).
+#
+# GET /__stats returns per-run timings (time to first delta, tokens, duration)
+# and POST /__reset clears them.
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_recorder import read_recording  # noqa: E402
+
+WORDS = (
+    "cooperative deck building worker placement engine strategy party family "
+    "light medium heavy tactical area control dice drafting"
+).split()
+
+
+ACTIVE_RUN_STATUSES = {"queued", "in_progress", "requires_action", "cancelling"}
+# Instructions and tool definitions, read by every run
+BASE_PROMPT_TOKENS = 400
+
+
+class MockState:
+    def __init__(self, args):
+        self.args = args
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.threads = {}
+        self.runs = {}
+        self.stats = []
+        self.rate_limited = 0
+        self.random = random.Random(args.seed)
+        # Recorded streams still to serve, in order
+        self.replay = read_recording(args.replay)[1] if args.replay else None
+        # Last state of each replayed run, for polls after a dropped or failed stream
+        self.replayed_runs = {}
+
+    def new_id(self, prefix):
+        with self.lock:
+            return f"{prefix}_{next(self.ids):06d}"
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+def now():
+    return int(time.time())
+
+
+def thread_object(thread_id):
+    return {
+        "id": thread_id,
+        "object": "thread",
+        "created_at": now(),
+        "metadata": {},
+        "tool_resources": None,
+    }
+
+
+def message_object(message_id, thread_id, role, text, run_id=None, status="completed"):
+    content = []
+    if text is not None:
+        content.append({"type": "text", "text": {"value": text, "annotations": []}})
+    return {
+        "id": message_id,
+        "object": "thread.message",
+        "created_at": now(),
+        "assistant_id": "asst_mock" if role == "assistant" else None,
+        "thread_id": thread_id,
+        "run_id": run_id,
+        "role": role,
+        "content": content,
+        "attachments": [],
+        "metadata": {},
+        "status": status,
+        "incomplete_details": None,
+        "completed_at": None,
+        "incomplete_at": None,
+    }
+
+
+def run_object(run, status, required_action=None, last_error=None):
+    return {
+        "id": run["id"],
+        "object": "thread.run",
+        "created_at": run["created_at"],
+        "assistant_id": run["assistant_id"],
+        "thread_id": run["thread_id"],
+        "status": status,
+        "required_action": required_action,
+        "last_error": last_error,
+        "expires_at": None,
+        "started_at": run["created_at"],
+        "cancelled_at": None,
+        "failed_at": now() if status == "failed" else None,
+        "completed_at": now() if status == "completed" else None,
+        "incomplete_details": run.get("incomplete_details"),
+        "model": "gpt-4o-mock",
+        "instructions": "",
+        "tools": [],
+        "metadata": {},
+        "usage": run.get("usage"),
+        "temperature": 1.0,
+        "top_p": 1.0,
+        "max_prompt_tokens": run.get("max_prompt_tokens"),
+        "max_completion_tokens": run.get("max_completion_tokens"),
+        "truncation_strategy": run.get("truncation_strategy") or {"type": "auto", "last_messages": None},
+        "response_format": "auto",
+        "tool_choice": "auto",
+        "parallel_tool_calls": True,
+    }
+
+
+def step_object(step_id, run, step_details, status="in_progress"):
+    return {
+        "id": step_id,
+        "object": "thread.run.step",
+        "created_at": now(),
+        "run_id": run["id"],
+        "assistant_id": run["assistant_id"],
+        "thread_id": run["thread_id"],
+        "type": step_details["type"],
+        "status": status,
+        "cancelled_at": None,
+        "completed_at": None,
+        "expires_at": None,
+        "failed_at": None,
+        "last_error": None,
+        "step_details": step_details,
+        "usage": None,
+        "metadata": {},
+    }
+
+
+def message_text(message):
+    return "".join(part["text"]["value"] for part in message["content"] if part["type"] == "text")
+
+
+def prompt_tokens(messages, body):
+    truncation = body.get("truncation_strategy") or {}
+    if truncation.get("type") == "last_messages" and truncation.get("last_messages"):
+        messages = messages[-truncation["last_messages"]:]
+    text = (body.get("additional_instructions") or "") + "".join(message_text(m) for m in messages)
+    tokens = BASE_PROMPT_TOKENS + len(text) // 4 + 4 * len(messages)
+    limit = body.get("max_prompt_tokens")
+    return min(tokens, limit) if limit else tokens
+
+
+def answer_tokens(state, prompt):
+    count = state.args.answer_tokens
+    rng = random.Random(f"{state.args.seed}:{prompt}")
+    tokens = []
+    game = 0
+    while len(tokens) < count:
+        game += 1
+        tokens.append(f"\n{game}. **Game {game}** -")
+        tokens.extend(f" {word}" for word in rng.choices(WORDS, k=10))
+        tokens.append(".")
+    return tokens[:count]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, body, status=200):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def maybe_fail(self):
+        if self.state.chance(self.state.args.failure_rate):
+            self.read_json()  # drain the body so the keep-alive connection stays usable
+            status = self.state.random.choice([429, 500, 503])
+            self.send_json({"error": {"message": "mock failure", "type": "server_error"}}, status)
+            return True
+        return False
+
+    def rate_limited(self):
+        limit = self.state.args.max_active_runs
+        if not limit:
+            return False
+        with self.state.lock:
+            active = sum(1 for run in self.state.runs.values() if run["status"] in ACTIVE_RUN_STATUSES)
+        if active < limit:
+            return False
+        self.read_json()
+        with self.state.lock:
+            self.state.rate_limited += 1
+        error = {"message": "Rate limit reached for runs", "type": "requests", "code": "rate_limit_exceeded"}
+        self.send_json({"error": error}, 429)
+        return True
+
+    def route(self, method):
+        path = self.path.split("?")[0]
+        for pattern, handler in ROUTES:
+            if pattern[0] != method:
+                continue
+            match = re.fullmatch(pattern[1], path)
+            if match:
+                return handler(self, *match.groups())
+        self.send_json({"error": {"message": f"no route for {method} {path}"}}, 404)
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_DELETE(self):
+        self.route("DELETE")
+
+    # SSE --------------------------------------------------------------------
+
+    def start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def send_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+    def send_done(self):
+        self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+        self.wfile.flush()
+
+    def stream_run(self, run):
+        state = self.state
+        if state.replay is not None:
+            self.replay_stream()
+            return
+        try:
+            self.start_sse()
+            if run.get("new_thread"):
+                self.send_event("thread.created", thread_object(run["thread_id"]))
+            if not run["resumed"]:
+                self.send_event("thread.run.created", run_object(run, "queued"))
+                self.send_event("thread.run.queued", run_object(run, "queued"))
+                time.sleep(state.args.queue_seconds)
+            run["status"] = "in_progress"
+            self.send_event("thread.run.in_progress", run_object(run, "in_progress"))
+
+            if not run["resumed"] and state.chance(state.args.tool_call_rate):
+                self.stream_tool_calls(run)
+                return
+            if not run["resumed"] and state.chance(state.args.code_interpreter_rate):
+                self.stream_code_interpreter(run)
+            self.stream_message(run)
+        except (BrokenPipeError, ConnectionResetError):
+            run["status"] = "cancelled"
+        finally:
+            run["finished_at"] = time.monotonic()
+
+    def stream_tool_calls(self, run):
+        calls = [
+            {
+                "id": self.state.new_id("call"),
+                "type": "function",
+                "function": {"name": self.state.args.tool_name, "arguments": self.state.args.tool_arguments},
+            }
+            for _ in range(self.state.args.tool_calls)
+        ]
+        step_id = self.state.new_id("step")
+        details = {"type": "tool_calls", "tool_calls": []}
+        self.send_event("thread.run.step.created", step_object(step_id, run, details))
+        for index, call in enumerate(calls):
+            self.send_event(
+                "thread.run.step.delta",
+                {
+                    "id": step_id,
+                    "object": "thread.run.step.delta",
+                    "delta": {
+                        "step_details": {
+                            "type": "tool_calls",
+                            "tool_calls": [{"index": index, **call, "function": {**call["function"], "output": None}}],
+                        }
+                    },
+                },
+            )
+        run["status"] = "requires_action"
+        self.send_event(
+            "thread.run.requires_action",
+            run_object(
+                run,
+                "requires_action",
+                {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": calls}},
+            ),
+        )
+        self.send_done()
+
+    def stream_code_interpreter(self, run):
+        state = self.state
+        step_id = state.new_id("step")
+        call_id = state.new_id("call")
+        details = {"type": "tool_calls", "tool_calls": []}
+        code = (
+            "import pandas as pd\n"
+            "games = pd.read_csv('/mnt/data/games.csv')\n"
+            f"print(games[games.players >= {len(run['prompt']) % 6 + 1}].head())"
+        )
+        logs = "".join(f"Game {i}  {i % 7 + 1}\n" for i in range(5))
+        interval = 1 / state.args.tokens_per_second if state.args.tokens_per_second else 0
+
+        def delta(call):
+            return {
+                "id": step_id,
+                "object": "thread.run.step.delta",
+                "delta": {"step_details": {"type": "tool_calls", "tool_calls": [{"index": 0, **call}]}},
+            }
+
+        self.send_event("thread.run.step.created", step_object(step_id, run, details))
+        self.send_event(
+            "thread.run.step.delta",
+            delta({"id": call_id, "type": "code_interpreter", "code_interpreter": {"input": "", "outputs": []}}),
+        )
+        for line in code.splitlines(keepends=True):
+            if interval:
+                time.sleep(interval)
+            self.send_event("thread.run.step.delta", delta({"type": "code_interpreter", "code_interpreter": {"input": line}}))
+        outputs = [{"index": 0, "type": "logs", "logs": logs}]
+        self.send_event("thread.run.step.delta", delta({"type": "code_interpreter", "code_interpreter": {"outputs": outputs}}))
+        call = {
+            "id": call_id,
+            "type": "code_interpreter",
+            "code_interpreter": {"input": code, "outputs": [{"type": "logs", "logs": logs}]},
+        }
+        details = {"type": "tool_calls", "tool_calls": [call]}
+        self.send_event("thread.run.step.completed", step_object(step_id, run, details, "completed"))
+
+    # Sends the recording's next stream; its events keep their recorded IDs
+    def replay_stream(self):
+        state = self.state
+        with state.lock:
+            segment = state.replay.pop(0) if state.replay else None
+        if segment is None:
+            self.send_json({"error": {"message": "the recording has no more streams", "type": "server_error"}}, 500)
+            return
+        speed = state.args.replay_speed
+        started = time.monotonic()
+        try:
+            self.start_sse()
+            for offset, event, data in segment:
+                if speed:
+                    delay = offset / speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                if data.get("object") == "thread.run":
+                    state.replayed_runs[data["id"]] = data
+                self.send_event(event, data)
+            self.send_done()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def drop_connection(self):
+        # RST instead of FIN so the client sees a broken stream, not a short one
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        self.connection.close()
+
+    def stream_message(self, run):
+        state = self.state
+        if state.chance(state.args.run_failure_rate):
+            run["status"] = "failed"
+            error = {"code": "server_error", "message": "mock run failure"}
+            self.send_event("thread.run.failed", run_object(run, "failed", last_error=error))
+            self.send_done()
+            return
+        thread = state.threads.setdefault(run["thread_id"], [])
+        message_id = state.new_id("msg")
+        step_id = state.new_id("step")
+        details = {"type": "message_creation", "message_creation": {"message_id": message_id}}
+        self.send_event("thread.run.step.created", step_object(step_id, run, details))
+        self.send_event(
+            "thread.message.created",
+            message_object(message_id, run["thread_id"], "assistant", None, run["id"], "in_progress"),
+        )
+        tokens = answer_tokens(state, run["prompt"])
+        limit = run.get("max_completion_tokens")
+        incomplete = bool(limit) and len(tokens) > limit
+        if incomplete:
+            tokens = tokens[:limit]
+        if state.args.prefill_tokens_per_second:
+            time.sleep(run["prompt_tokens"] / state.args.prefill_tokens_per_second)
+        drop_at = len(tokens) // 2 if state.chance(state.args.drop_rate) else None
+        interval = 1 / state.args.tokens_per_second if state.args.tokens_per_second else 0
+        text = ""
+        for index, token in enumerate(tokens):
+            if run["status"] == "cancelling":
+                run["status"] = "cancelled"
+                self.send_event("thread.run.cancelled", run_object(run, "cancelled"))
+                self.send_done()
+                return
+            if index == drop_at:
+                thread.append(message_object(message_id, run["thread_id"], "assistant", "".join(tokens), run["id"]))
+                run["status"] = "completed"
+                self.drop_connection()
+                return
+            if interval:
+                time.sleep(interval)
+            text += token
+            self.send_event(
+                "thread.message.delta",
+                {
+                    "id": message_id,
+                    "object": "thread.message.delta",
+                    "delta": {"content": [{"index": 0, "type": "text", "text": {"value": token, "annotations": []}}]},
+                },
+            )
+            if index == 0:
+                run["first_delta_at"] = time.monotonic()
+            run["tokens"] += 1
+        status = "incomplete" if incomplete else "completed"
+        message = message_object(message_id, run["thread_id"], "assistant", text, run["id"], status)
+        thread.append(message)
+        self.send_event(f"thread.message.{status}", message)
+        self.send_event(
+            "thread.run.step.completed", step_object(step_id, run, details, "completed")
+        )
+        run["status"] = status
+        if incomplete:
+            run["incomplete_details"] = {"reason": "max_completion_tokens"}
+        run["usage"] = {
+            "prompt_tokens": run["prompt_tokens"],
+            "completion_tokens": run["tokens"],
+            "total_tokens": run["prompt_tokens"] + run["tokens"],
+        }
+        self.send_event(f"thread.run.{status}", run_object(run, status))
+        self.send_done()
+
+    # Routes -------------------------------------------------------------------
+
+    def create_thread(self):
+        if self.maybe_fail():
+            return
+        time.sleep(self.state.args.api_latency)
+        body = self.read_json()
+        thread_id = self.state.new_id("thread")
+        self.state.threads[thread_id] = [
+            message_object(self.state.new_id("msg"), thread_id, m["role"], m["content"])
+            for m in body.get("messages", [])
+        ]
+        self.send_json(thread_object(thread_id))
+
+    def delete_thread(self, thread_id):
+        self.state.threads.pop(thread_id, None)
+        self.send_json({"id": thread_id, "object": "thread.deleted", "deleted": True})
+
+    def create_message(self, thread_id):
+        if self.maybe_fail():
+            return
+        time.sleep(self.state.args.api_latency)
+        body = self.read_json()
+        content = body.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        message = message_object(self.state.new_id("msg"), thread_id, body.get("role", "user"), content)
+        self.state.threads.setdefault(thread_id, []).append(message)
+        self.send_json(message)
+
+    def list_messages(self, thread_id):
+        query = parse_qs(urlparse(self.path).query)
+        messages = self.state.threads.get(thread_id, [])
+        if "run_id" in query:
+            messages = [m for m in messages if m["run_id"] == query["run_id"][0]]
+        if query.get("order") == ["desc"]:
+            messages = messages[::-1]
+        self.send_json(
+            {
+                "object": "list",
+                "data": messages,
+                "first_id": messages[0]["id"] if messages else None,
+                "last_id": messages[-1]["id"] if messages else None,
+                "has_more": False,
+            }
+        )
+
+    def new_run(self, thread_id, body):
+        messages = self.state.threads.get(thread_id, [])
+        prompt = next(
+            (m["content"][0]["text"]["value"] for m in reversed(messages) if m["role"] == "user" and m["content"]),
+            "",
+        )
+        run = {
+            "id": self.state.new_id("run"),
+            "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id", "asst_mock"),
+            "created_at": now(),
+            "requested_at": time.monotonic(),
+            "first_delta_at": None,
+            "finished_at": None,
+            "status": "queued",
+            "tokens": 0,
+            "prompt": prompt,
+            "prompt_tokens": prompt_tokens(messages, body),
+            "max_prompt_tokens": body.get("max_prompt_tokens"),
+            "max_completion_tokens": body.get("max_completion_tokens"),
+            "truncation_strategy": body.get("truncation_strategy"),
+            "resumed": False,
+        }
+        with self.state.lock:
+            self.state.runs[run["id"]] = run
+            self.state.stats.append(run)
+        return run
+
+    def create_run(self, thread_id):
+        if self.maybe_fail() or self.rate_limited():
+            return
+        time.sleep(self.state.args.api_latency)
+        body = self.read_json()
+        run = self.new_run(thread_id, body)
+        if body.get("stream"):
+            self.stream_run(run)
+        else:
+            self.send_json(run_object(run, "queued"))
+
+    def create_thread_and_run(self):
+        if self.maybe_fail() or self.rate_limited():
+            return
+        time.sleep(self.state.args.api_latency)
+        body = self.read_json()
+        thread_id = self.state.new_id("thread")
+        self.state.threads[thread_id] = [
+            message_object(self.state.new_id("msg"), thread_id, m["role"], m["content"])
+            for m in (body.get("thread") or {}).get("messages", [])
+        ]
+        run = self.new_run(thread_id, body)
+        run["new_thread"] = True
+        if body.get("stream"):
+            self.stream_run(run)
+        else:
+            # Non-streaming callers poll; answer synchronously so the first poll completes
+            run["resumed"] = True
+            text = "".join(answer_tokens(self.state, run["prompt"]))
+            self.state.threads[thread_id].append(
+                message_object(self.state.new_id("msg"), thread_id, "assistant", text, run["id"])
+            )
+            run["status"] = "completed"
+            self.send_json(run_object(run, "completed"))
+
+    def get_assistant(self, assistant_id):
+        time.sleep(self.state.args.api_latency)
+        functions = self.state.args.assistant_functions or [self.state.args.tool_name]
+        tools = [{"type": "code_interpreter"}] + [
+            {"type": "function", "function": {"name": name, "parameters": {"type": "object", "properties": {}}}}
+            for name in functions
+        ]
+        self.send_json(
+            {
+                "id": assistant_id,
+                "object": "assistant",
+                "created_at": now(),
+                "name": "Mock assistant",
+                "description": None,
+                "model": "gpt-4o-mock",
+                "instructions": "",
+                "tools": tools,
+                "metadata": {},
+                "temperature": 1.0,
+                "top_p": 1.0,
+                "response_format": "auto",
+            }
+        )
+
+    def get_run(self, thread_id, run_id):
+        run = self.state.runs.get(run_id)
+        if run is None and run_id in self.state.replayed_runs:
+            return self.send_json(self.state.replayed_runs[run_id])
+        if run is None:
+            return self.send_json({"error": {"message": "no such run"}}, 404)
+        self.send_json(run_object(run, run["status"]))
+
+    def submit_tool_outputs(self, thread_id, run_id):
+        body = self.read_json()
+        if self.state.replay is not None:
+            self.replay_stream()
+            return
+        run = self.state.runs[run_id]
+        run["resumed"] = True
+        run["status"] = "in_progress"
+        run["tool_outputs"] = body.get("tool_outputs", [])
+        if body.get("stream"):
+            self.stream_run(run)
+        else:
+            self.send_json(run_object(run, "in_progress"))
+
+    def cancel_run(self, thread_id, run_id):
+        run = self.state.runs.get(run_id)
+        if run is None:
+            return self.send_json({"error": {"message": "no such run"}}, 404)
+        if run["status"] in ("queued", "in_progress", "requires_action"):
+            run["status"] = "cancelling"
+        self.send_json(run_object(run, run["status"]))
+
+    def file_content(self, file_id):
+        payload = ("name,players\n" + "".join(f"Game {i},{i % 7 + 1}\n" for i in range(1000))).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def get_stats(self):
+        with self.state.lock:
+            runs = [
+                {
+                    "id": run["id"],
+                    "thread_id": run["thread_id"],
+                    "status": run["status"],
+                    "tokens": run["tokens"],
+                    "prompt_tokens": run["prompt_tokens"],
+                    "ttft_seconds": run["first_delta_at"] - run["requested_at"] if run["first_delta_at"] else None,
+                    "duration_seconds": run["finished_at"] - run["requested_at"] if run["finished_at"] else None,
+                }
+                for run in self.state.stats
+            ]
+        self.send_json({"runs": runs, "rate_limited": self.state.rate_limited})
+
+    def reset_stats(self):
+        with self.state.lock:
+            self.state.stats = []
+            self.state.rate_limited = 0
+        self.send_json({"ok": True})
+
+
+ROUTES = [
+    (("GET", r"/v1/assistants/([^/]+)"), Handler.get_assistant),
+    (("POST", r"/v1/threads"), Handler.create_thread),
+    (("DELETE", r"/v1/threads/([^/]+)"), Handler.delete_thread),
+    (("POST", r"/v1/threads/runs"), Handler.create_thread_and_run),
+    (("POST", r"/v1/threads/([^/]+)/messages"), Handler.create_message),
+    (("GET", r"/v1/threads/([^/]+)/messages"), Handler.list_messages),
+    (("POST", r"/v1/threads/([^/]+)/runs"), Handler.create_run),
+    (("GET", r"/v1/threads/([^/]+)/runs/([^/]+)"), Handler.get_run),
+    (("POST", r"/v1/threads/([^/]+)/runs/([^/]+)/submit_tool_outputs"), Handler.submit_tool_outputs),
+    (("POST", r"/v1/threads/([^/]+)/runs/([^/]+)/cancel"), Handler.cancel_run),
+    (("GET", r"/v1/files/([^/]+)/content"), Handler.file_content),
+    (("GET", r"/__stats"), Handler.get_stats),
+    (("POST", r"/__reset"), Handler.reset_stats),
+]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=300)
+    parser.add_argument("--queue-seconds", type=float, default=0.2)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--tool-call-rate", type=float, default=0.0)
+    parser.add_argument("--tool-calls", type=int, default=1)
+    parser.add_argument("--tool-name", default="example_function")
+    parser.add_argument("--tool-arguments", default=json.dumps({"address": "mock"}), help="JSON arguments of each call")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--run-failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-active-runs", type=int, default=0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--assistant-functions", nargs="*", help="Functions the assistant declares (default: --tool-name)")
+    parser.add_argument("--code-interpreter-rate", type=float, default=0.0)
+    parser.add_argument("--replay", help="Recorded turn (.jsonl.gz) to serve instead of generated runs")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser
+
+
+def serve(args):
+    Handler.state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    args = build_parser().parse_args()
+    server = serve(args)
+    print(f"mock Assistants API on http://{args.host}:{server.server_port}/v1", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Fills QuestionCache with synthetic first-turn questions and reports lookup
+# latency, then scores labelled pairs: paraphrases that should hit and near
+# misses that must not.
+#
+#   python benchmarks/question_cache_benchmark.py [--entries 100000] [--threshold 0.85]
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_cache import QuestionCache  # noqa: E402
+
+THEMES = (
+    "fantasy sci-fi space pirate zombie horror mystery detective medieval viking farming trains "
+    "dinosaur ocean jungle western steampunk cyberpunk war economic civilization city nature animal"
+).split()
+MECHANICS = (
+    "deck building, worker placement, area control, dice rolling, drafting, bluffing, tile laying, "
+    "push your luck, engine building, hidden roles, trading, auctions, set collection, roll and write"
+).split(", ")
+AUDIENCES = "kids, families, couples, beginners, experts, parties, teenagers, gamers, seniors".split(", ")
+SYLLABLES = "ca tan ra zor mi lo ven ta gor ash ble dor ki nu pex ol wyn tra".split()
+TEMPLATES = [
+    "What are good {theme} games with {mechanic} for {n} players?",
+    "Which {mechanic} games would you recommend for {audience}?",
+    "Any {theme} games for {audience} that use {mechanic}?",
+    "I want a {theme} game about {mechanic} that plays in under {minutes} minutes",
+    "Best {theme} {mechanic} games for {n} players under {minutes} minutes",
+    "Do you have {theme} games for {audience} with {mechanic}?",
+    "Games like {title} but with more {mechanic}",
+    "Is {title} a good game for {audience}?",
+    "How long does {title} take with {n} players?",
+]
+
+# (cached question, new question, should hit)
+PAIRS = [
+    ("best 2 player games", "good games for two people", True),
+    ("best 2 player games", "top two-player games", True),
+    ("best 2 player games", "What's a good 2p game?", True),
+    ("What are some good cooperative games for beginners?", "cooperative games for a beginner?", True),
+    ("Which party games work for large groups?", "party games for large groups", True),
+    ("Can you recommend a deck building game for 3 players?", "deck-building games for three players", True),
+    ("What are your top rated worker placement games?", "best worker placement games", True),
+    ("Any games for couples on date night?", "games for a couple's date night", True),
+    ("best 2 player games", "best 3 player games", False),
+    ("best 2 player games", "best 2 player cooperative games", False),
+    ("What are some good cooperative games for beginners?", "competitive games for beginners", False),
+    ("Which party games work for large groups?", "party games for small groups", False),
+    ("games under 30 minutes for 4 players", "games under 60 minutes for 4 players", False),
+    ("What are good horror games?", "What are good mystery games?", False),
+    ("deck building games for kids", "deck building games for experts", False),
+    ("What are the rules of Catan?", "What are the rules of Carcassonne?", False),
+    ("What are the best cooperative games for 4 players?", "no cooperative games for 4 players please", False),
+    ("cooperative 2 player games", "no cooperative 2 player games", False),
+    ("games for 4 players", "games for 4 players without dice", False),
+    ("games without dice for 2 players", "2 player games without dice", True),
+]
+
+
+def synthetic_questions(count, seed=11):
+    rng = random.Random(seed)
+    questions = set()
+    while len(questions) < count:
+        questions.add(rng.choice(TEMPLATES).format(
+            theme=rng.choice(THEMES),
+            mechanic=rng.choice(MECHANICS),
+            audience=rng.choice(AUDIENCES),
+            n=rng.randint(1, 8),
+            minutes=rng.choice([15, 20, 30, 45, 60, 90, 120]),
+            title="".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title(),
+        ))
+    return list(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    cache = QuestionCache(threshold=args.threshold, max_entries=args.entries, sample_rate=0)
+    questions = synthetic_questions(args.entries)
+    start = time.perf_counter()
+    for question in questions:
+        cache.set("asst", question, [{"name": "assistant", "msg": question}])
+    print(f"cached {len(cache)} questions in {time.perf_counter() - start:.1f} s")
+
+    rng = random.Random(5)
+    # Half repeat a cached question in other words, half are new questions
+    probes = [
+        rng.choice(questions).replace("What are good", "Any good").replace("?", "")
+        if i % 2 else f"{rng.choice(THEMES)} {rng.choice(THEMES)} games for {rng.choice(AUDIENCES)} please"
+        for i in range(args.lookups)
+    ]
+    timings = []
+    for probe in probes:
+        started = time.perf_counter()
+        cache.get("asst", probe)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(
+        f"lookup ms: p50 {statistics.median(timings) * 1000:.3f}"
+        f"  p99 {timings[int(len(timings) * 0.99)] * 1000:.3f}  max {timings[-1] * 1000:.3f}"
+        f"  hit rate {cache.stats()['hit_rate']:.2f}"
+    )
+
+    hits = false_hits = positives = negatives = 0
+    print(f"\n{'score':>6}  {'expect':>6}  pair")
+    for cached, question, expected in PAIRS:
+        pair_cache = QuestionCache(threshold=args.threshold)
+        # A realistic IDF comes from a populated cache
+        for other in questions[:2000]:
+            pair_cache.set("asst", other, [{"name": "assistant", "msg": other}])
+        pair_cache.set("asst", cached, [{"name": "assistant", "msg": cached}])
+        result = pair_cache.get("asst", question)
+        matched = result is not None and result[1] == cached
+        positives += expected
+        negatives += not expected
+        hits += expected and matched
+        false_hits += matched and not expected
+        score = f"{result[2]:.3f}" if matched else "-"
+        print(f"{score:>6}  {'hit' if expected else 'miss':>6}  {cached!r} <- {question!r}")
+    print(f"\nparaphrase hit rate {hits}/{positives}, false hits {false_hits}/{negatives}")
+    # An answer for the opposite question is worse than no answer
+    if false_hits:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
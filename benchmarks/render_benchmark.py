@@ -0,0 +1,115 @@
+# Feeds a delta stream through the streaming renderer and reports CPU time and UI updates.
+#
+#   python benchmarks/render_benchmark.py [--deltas recorded.json] [--tokens 5000]
+#
+# A recorded stream is a JSON list of delta strings; without one a synthetic
+# game-list answer of the requested length is generated.
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rendering import StreamRenderer, rewrite_links  # noqa: E402
+
+
+class CountingPlaceholder:
+    def __init__(self):
+        self.updates = 0
+        self.bytes_sent = 0
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.updates += 1
+        self.bytes_sent += len(body.encode())
+
+
+def synthetic_deltas(tokens, seed=7):
+    rng = random.Random(seed)
+    words = "cooperative deck building worker placement engine heavy light strategy party".split()
+    deltas = []
+    game = 0
+    while len(deltas) < tokens:
+        game += 1
+        line = f"{game}. **Game {game}** - {' '.join(rng.choices(words, k=12))}. "
+        if game % 10 == 0:
+            line += f"[rules_{game}.pdf](sandbox:/mnt/data/rules_{game}.pdf) "
+        line += "\n"
+        deltas.extend(line[i:i + 4] for i in range(0, len(line), 4))
+    return deltas[:tokens]
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_legacy(deltas, tokens_per_second):
+    placeholder = CountingPlaceholder()
+    snapshot = ""
+    start = time.process_time()
+    for delta in deltas:
+        snapshot += delta
+        text_value = re.sub(r"\[(.*?)\]\s*\(\s*(.*?)\s*\)", "Download Link", snapshot)
+        placeholder.markdown(text_value, True)
+    return time.process_time() - start, placeholder
+
+
+def run_buffered(deltas, tokens_per_second, interval, min_chars):
+    placeholder = CountingPlaceholder()
+    clock = SimulatedClock()
+    renderer = StreamRenderer(
+        placeholder,
+        rewrite=rewrite_links,
+        interval=interval,
+        min_chars=min_chars,
+        clock=clock,
+    )
+    start = time.process_time()
+    for delta in deltas:
+        clock.now += 1 / tokens_per_second
+        renderer.append(delta)
+    renderer.flush(final=True)
+    return time.process_time() - start, placeholder
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deltas", help="JSON file with a recorded list of text deltas")
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--interval-ms", type=float, default=50.0)
+    parser.add_argument("--min-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    if args.deltas:
+        with open(args.deltas) as f:
+            deltas = json.load(f)
+    else:
+        deltas = synthetic_deltas(args.tokens)
+
+    legacy_cpu, legacy = run_legacy(deltas, args.tokens_per_second)
+    buffered_cpu, buffered = run_buffered(
+        deltas, args.tokens_per_second, args.interval_ms / 1000, args.min_chars
+    )
+
+    print(f"deltas: {len(deltas)}  characters: {sum(map(len, deltas))}")
+    print(f"{'mode':<10}{'cpu s':>10}{'updates':>10}{'MB sent':>10}")
+    for name, cpu, placeholder in (
+        ("legacy", legacy_cpu, legacy),
+        ("buffered", buffered_cpu, buffered),
+    ):
+        print(
+            f"{name:<10}{cpu:>10.3f}{placeholder.updates:>10}"
+            f"{placeholder.bytes_sent / 1e6:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# Replays recorded Assistants event streams through the app's EventHandler in
+# a headless Streamlit test, to profile the streaming path and catch
+# regressions in it without calling the API.
+#
+#   python benchmarks/replay_benchmark.py [recordings...] [--speed 0] [--repeat 3]
+#   python benchmarks/replay_benchmark.py --profile cprofile --profile-out replay.prof
+#   python benchmarks/replay_benchmark.py --record benchmarks/recordings
+#
+# Recordings are the .jsonl.gz files the app writes to EVENT_RECORD_DIR; the
+# default is the corpus in benchmarks/recordings. Each recording's question is
+# sent through the chat input while the mock API, in this process, serves the
+# recorded streams over HTTP, so the SDK's stream parsing, the event handler
+# and rendering all run as they do live. --speed 1 keeps the recorded pace, 0
+# sends every event at once. --profile profiles the script and turn threads with
+# cProfile, or with pyinstrument when it is installed.
+#
+# Each replay is checked against its recording: every stream is consumed, and
+# every code interpreter and function call shows exactly once in the chat
+# however many times the stream reports it done. A failed check exits 1.
+#
+# --record rebuilds the corpus from the mock's generated runs: short and long
+# answers, a function call, a code interpreter step, a run that fails after
+# its retries and one cut short by max_completion_tokens.
+import argparse
+import contextlib
+import cProfile
+import glob
+import os
+import pstats
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from streamlit.testing.v1 import AppTest
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS)
+
+import mock_api  # noqa: E402
+from event_recorder import read_recording  # noqa: E402
+from load_test import ERROR_TEXT, ROOT  # noqa: E402
+
+CORPUS = os.path.join(BENCHMARKS, "recordings")
+# The script thread, and the worker it hands each turn to (app.TURN_THREAD)
+SCRIPT_THREADS = ("ScriptRunner.scriptThread", "turn")
+CODE_INPUT = "### code interpreter\ninput:"
+FUNCTION_CALL = "### Function Calling:"
+# name: (question, mock options, app settings)
+SCENARIOS = {
+    "answer": ("What are some good games for 4 players?", [], {}),
+    "long_answer": (
+        "Could you list a lot of cooperative games for a big group?",
+        ["--answer-tokens", "1500", "--tokens-per-second", "200"],
+        {},
+    ),
+    "function_call": ("Which games fit 3 players in under an hour?", ["--tool-call-rate", "1"], {}),
+    "code_interpreter": ("How many games in the library play with 6?", ["--code-interpreter-rate", "1"], {}),
+    "failed": ("What should we play tonight?", ["--run-failure-rate", "1"], {}),
+    "incomplete": (
+        "Tell me everything about deck building games.",
+        ["--answer-tokens", "600"],
+        {"CONTEXT_MAX_COMPLETION_TOKENS": "120"},
+    ),
+}
+
+
+def start_mock():
+    args = mock_api.build_parser().parse_args(["--port", "0", "--api-latency", "0", "--queue-seconds", "0.1"])
+    server = mock_api.serve(args)
+    threading.Thread(target=server.serve_forever, name="mock-api", daemon=True).start()
+    os.environ.update(
+        OPENAI_BASE_URL=f"http://127.0.0.1:{server.server_port}/v1",
+        OPENAI_API_KEY="mock",
+        ASSISTANT_ID="asst_replay",
+        CONVERSATION_STORE="memory",
+        QUESTION_CACHE_SIZE="0",
+        # Resumed runs are timed by their streams, not the wait before them
+        RUN_RETRY_BACKOFF="0",
+    )
+    return server
+
+
+def set_mock(options, replay=None, speed=0.0):
+    args = mock_api.build_parser().parse_args(["--api-latency", "0", "--queue-seconds", "0.1", *options])
+    args.replay_speed = speed
+    state = mock_api.MockState(args)
+    state.replay = replay
+    mock_api.Handler.state = state
+    return state
+
+
+# Runs the wrapped code with a profiler started in each script or turn thread it starts
+@contextlib.contextmanager
+def profile_script_threads(new_profiler, profilers):
+    original = threading.Thread.run
+
+    def run(thread):
+        if thread.name not in SCRIPT_THREADS:
+            return original(thread)
+        profiler = new_profiler()
+        profilers.append(profiler)
+        profiler.start()
+        try:
+            return original(thread)
+        finally:
+            profiler.stop()
+
+    threading.Thread.run = run
+    try:
+        yield
+    finally:
+        threading.Thread.run = original
+
+
+class CProfiler(cProfile.Profile):
+    def start(self):
+        self.enable()
+
+    def stop(self):
+        self.disable()
+
+
+def new_profiler(kind):
+    if kind == "cprofile":
+        return CProfiler
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        sys.exit("--profile pyinstrument needs pyinstrument installed (pip install pyinstrument)")
+    return lambda: Profiler(async_mode="disabled")
+
+
+def report_profile(kind, profilers, out, limit):
+    if kind == "cprofile":
+        stats = pstats.Stats(*profilers)
+        if out:
+            stats.dump_stats(out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+        return
+    from pyinstrument.session import Session
+
+    session = profilers[0].last_session
+    for profiler in profilers[1:]:
+        session = Session.combine(session, profiler.last_session)
+    if out:
+        session.save(out)
+    from pyinstrument.renderers import ConsoleRenderer
+
+    print(ConsoleRenderer(unicode=True, color=False, short_mode=True).render(session))
+
+
+def ask(question, profile=None, profilers=None):
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+    at.run()
+    at.chat_input[0].set_value(question)
+    hook = profile_script_threads(new_profiler(profile), profilers) if profile else contextlib.nullcontext()
+    start = time.perf_counter()
+    with hook:
+        at.run()
+    seconds = time.perf_counter() - start
+    return at, seconds
+
+
+def expected_calls(segments):
+    code = set()
+    functions = set()
+    for segment in segments:
+        for _, event, data in segment:
+            if event == "thread.run.step.completed" and data["step_details"]["type"] == "tool_calls":
+                code.update(call["id"] for call in data["step_details"]["tool_calls"] if call["type"] == "code_interpreter")
+            elif event == "thread.run.requires_action":
+                functions.update(call["id"] for call in data["required_action"]["submit_tool_outputs"]["tool_calls"])
+    return len(code), len(functions)
+
+
+# Returns the problems found with one replay, empty when it matched the recording
+def check(at, state, segments):
+    problems = []
+    if at.exception:
+        problems.append(f"script raised {at.exception[0].value}")
+    if state.replay:
+        problems.append(f"{len(state.replay)} recorded streams not requested")
+    entries = [entry["msg"] for entry in at.session_state["chat_log"]]
+    code, functions = expected_calls(segments)
+    shown_code = sum(entry.startswith(CODE_INPUT) for entry in entries)
+    shown_functions = sum(entry.startswith(FUNCTION_CALL) for entry in entries)
+    if shown_code != code:
+        problems.append(f"{shown_code} code interpreter inputs shown for {code} calls")
+    if shown_functions != functions:
+        problems.append(f"{shown_functions} function calls shown for {functions} calls")
+    return problems
+
+
+def record(directory):
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["EVENT_RECORD_DIR"] = tmp
+        for name, (question, options, settings) in SCENARIOS.items():
+            os.environ.update(settings)
+            set_mock(options)
+            ask(question)
+            for key in settings:
+                del os.environ[key]
+            (path,) = glob.glob(os.path.join(tmp, "*.jsonl.gz"))
+            shutil.move(path, os.path.join(directory, f"{name}.jsonl.gz"))
+            header, _ = read_recording(os.path.join(directory, f"{name}.jsonl.gz"))
+            print(f"{name:>18}  {header['outcome']:<10}{header['events']:>6} events{header['segments']:>3} streams")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recordings", nargs="*", help="Recorded turns or directories of them")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 replays at the recorded pace, 0 as fast as possible")
+    parser.add_argument("--repeat", type=int, default=3, help="Replays of each recording to take the median of")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"])
+    parser.add_argument("--profile-out", help="Write the combined profile here (pstats or pyinstrument session)")
+    parser.add_argument("--profile-limit", type=int, default=30, help="Functions shown in the cProfile report")
+    parser.add_argument("--record", metavar="DIRECTORY", help="Record the scenario corpus into DIRECTORY")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    start_mock()
+    if args.record:
+        record(args.record)
+        return
+    # Replays must not write recordings of their own
+    os.environ["EVENT_RECORD_DIR"] = ""
+
+    paths = []
+    for path in args.recordings or [CORPUS]:
+        paths.extend(sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))) if os.path.isdir(path) else [path])
+    # The first turn in the process builds the shared client and caches; keep it out of the numbers
+    header, segments = read_recording(paths[0])
+    set_mock([], segments)
+    ask(header["question"])
+
+    profilers = []
+    failures = 0
+    print(f"{'recording':>18}{'outcome':>12}{'events':>8}{'streams':>9}{'recorded s':>12}{'replay s':>10}{'events/s':>10}  check")
+    for path in paths:
+        header, segments = read_recording(path)
+        timings = []
+        problems = []
+        for _ in range(args.repeat):
+            state = set_mock([], [list(segment) for segment in segments], args.speed)
+            at, seconds = ask(header["question"], args.profile, profilers)
+            timings.append(seconds)
+            problems = problems or check(at, state, segments)
+            if ERROR_TEXT in "".join(markdown.value for markdown in at.markdown) and header["outcome"] == "ok":
+                problems.append("the app showed its error message")
+        seconds = statistics.median(timings)
+        failures += bool(problems)
+        name = os.path.basename(path).removesuffix(".jsonl.gz")
+        print(
+            f"{name:>18}{header['outcome']:>12}{header['events']:>8}{header['segments']:>9}"
+            f"{header['seconds']:>12.2f}{seconds:>10.3f}{header['events'] / seconds:>10.0f}  "
+            + ("; ".join(problems) if problems else "ok"),
+            flush=True,
+        )
+    if args.profile and profilers:
+        print()
+        report_profile(args.profile, profilers, args.profile_out, args.profile_limit)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Measures script rerun time and the delta messages sent for the page scaffold
+# of an idle chat screen.
+#
+#   python benchmarks/scaffold_benchmark.py [--reruns 20] [--revision HEAD~1]
+#
+# Every element and block on the page is one delta message to the browser;
+# bytes are the serialized size of those deltas. --revision also measures the
+# app.py of an earlier commit for comparison.
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def walk(node):
+    yield node
+    for child in getattr(node, "children", {}).values():
+        yield from walk(child)
+
+
+def deltas(at):
+    count = size = 0
+    for node in walk(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is None:
+            continue
+        count += 1
+        size += proto.ByteSize()
+    return count, size
+
+
+def measure(path, reruns):
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("CONVERSATION_STORE", "memory")
+    at = AppTest.from_file(path, default_timeout=60)
+    at.run()
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    count, size = deltas(at)
+    return statistics.median(timings), count, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--revision", help="also measure app.py as of this git revision")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    apps = [("current", os.path.join(ROOT, "app.py"))]
+    if args.revision:
+        source = subprocess.run(
+            ["git", "show", f"{args.revision}:app.py"], check=True, capture_output=True, text=True
+        ).stdout
+        baseline = os.path.join(ROOT, ".scaffold_benchmark_app.py")
+        with open(baseline, "w") as f:
+            f.write(source)
+        apps.insert(0, (args.revision, baseline))
+
+    print(f"{'app':>10}{'rerun ms':>12}{'deltas':>10}{'delta KB':>10}")
+    try:
+        for name, path in apps:
+            seconds, count, size = measure(path, args.reruns)
+            print(f"{name:>10}{seconds * 1000:>12.1f}{count:>10}{size / 1024:>10.1f}")
+    finally:
+        if args.revision:
+            os.remove(baseline)
+
+
+if __name__ == "__main__":
+    main()
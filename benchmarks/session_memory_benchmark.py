@@ -0,0 +1,89 @@
+# Measures resident memory per session when every session holds its whole chat
+# log in session state versus a bounded window backed by the conversation store.
+#
+#   python benchmarks/session_memory_benchmark.py [--sessions 100 1000] [--messages 200] [--window 50]
+#
+# Each configuration runs in a fresh interpreter so RSS starts from the same
+# baseline. Sessions are plain dicts shaped like st.session_state.
+import argparse
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def make_entry(session, i):
+    if i % 2 == 0:
+        return {"name": "user", "msg": f"{session}: what are good games for {i % 7 + 1} players?"}
+    games = "\n".join(
+        f"{n}. **Game {i}-{n}** - a medium weight strategy game with great replayability."
+        for n in range(1, 11)
+    )
+    return {"name": "assistant", "msg": f"{session}: here are some picks:\n{games}"}
+
+
+def simulate(mode, sessions, messages, window, store_url):
+    from conversation_store import new_session_token, open_store
+
+    store = open_store(store_url) if mode == "bounded" else None
+    gc.collect()
+    baseline = rss_bytes()
+    states = []
+    for _ in range(sessions):
+        state = {"session_id": new_session_token(), "chat_log": [], "chat_offset": 0, "tool_calls": []}
+        for i in range(messages):
+            entry = make_entry(state["session_id"], i)
+            state["chat_log"].append(entry)
+            if store is not None:
+                store.append(state["session_id"], [entry])
+                overflow = len(state["chat_log"]) - window
+                if overflow > 0:
+                    del state["chat_log"][:overflow]
+                    state["chat_offset"] += overflow
+        states.append(state)
+    gc.collect()
+    return (rss_bytes() - baseline) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SESSIONS"), help=argparse.SUPPRESS)
+    parser.add_argument("--store", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, sessions = args.child[0], int(args.child[1])
+        print(simulate(mode, sessions, args.messages, args.window, args.store))
+        return
+
+    print(f"{'sessions':>10}{'mode':>10}{'KB/session':>12}{'total MB':>10}")
+    for sessions in args.sessions:
+        for mode in ("unbounded", "bounded"):
+            with tempfile.TemporaryDirectory() as directory:
+                store = f"sqlite:///{os.path.join(directory, 'conversations.db')}"
+                output = subprocess.run(
+                    [
+                        sys.executable, __file__, "--child", mode, str(sessions),
+                        "--messages", str(args.messages), "--window", str(args.window),
+                        "--store", store,
+                    ],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+            per_session = float(output)
+            print(f"{sessions:>10}{mode:>10}{per_session / 1024:>12.1f}{per_session * sessions / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
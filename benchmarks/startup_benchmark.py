@@ -0,0 +1,135 @@
+# Measures what a freshly started app costs its first visitor, cold and after
+# the startup warm-up. Each boot starts the mock API and the app, then:
+#
+#   cold    the first visitor connects as soon as Streamlit answers health
+#           checks, so its session starts the warm-up and its first turn
+#           meets the empty connection pool and the unloaded game library
+#   warmed  the startup probe (/_stcore/script-health-check) is requested
+#           first and the visitor waits until /ready on METRICS_PORT says 200,
+#           as it would behind a load balancer
+#
+#   python benchmarks/startup_benchmark.py [--boots 3] [--games 50000]
+#
+# The first turn calls find_games, so it reads the library. "ready s" is from
+# process start until /ready answered 200; the steps after it are the
+# warm-up's own timings from the /ready body.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from game_catalog_benchmark import write_library  # noqa: E402
+from load_test import HeadlessSession, start_processes  # noqa: E402
+
+QUESTION = "Which games can 4 of us play?"
+MOCK_ARGS = ["--tool-name", "find_games", "--tool-arguments", json.dumps({"players": 4})]
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code != 503:
+                raise
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{url} did not report ready")
+        time.sleep(0.05)
+
+
+def boot(args, settings, warm):
+    started = time.monotonic()
+    mock, app = start_processes(settings, mock_args=MOCK_ARGS)
+    base = f"http://127.0.0.1:{args.app_port}"
+    try:
+        up = time.monotonic() - started
+        report = None
+        if warm:
+            urllib.request.urlopen(f"{base}/_stcore/script-health-check").read()
+            report = wait_until_ready(f"http://127.0.0.1:{args.metrics_port}/ready", args.timeout)
+        ready = time.monotonic() - started
+        session = HeadlessSession(f"ws://127.0.0.1:{args.app_port}/_stcore/stream", args.marker, args.timeout)
+        result = asyncio.run(session.run(QUESTION))
+    finally:
+        app.terminate()
+        mock.terminate()
+        app.wait()
+        mock.wait()
+    result["up_seconds"] = up
+    result["ready_seconds"] = ready if warm else None
+    result["timings"] = report["timings"] if report else {}
+    return result
+
+
+def median(results, key):
+    values = [result[key] for result in results if result.get(key) is not None]
+    return statistics.median(values) if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boots", type=int, default=3, help="Restarts in each mode to take the median of")
+    parser.add_argument("--games", type=int, default=50000, help="Games in the generated library")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Mock latency per API request")
+    parser.add_argument("--app-port", type=int, default=8597)
+    parser.add_argument("--mock-port", type=int, default=8763)
+    parser.add_argument("--metrics-port", type=int, default=9467)
+    parser.add_argument("--marker", default="**Game", help="Text that identifies streamed answer markdown")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = os.path.join(tmp, "games.csv")
+        write_library(library, args.games)
+        settings = SimpleNamespace(
+            app_port=args.app_port,
+            mock_port=args.mock_port,
+            tokens_per_second=200.0,
+            answer_tokens=40,
+            tool_call_rate=1.0,
+            failure_rate=0.0,
+            drop_rate=0.0,
+            run_failure_rate=0.0,
+            api_latency=args.api_latency,
+            queue_seconds=0.2,
+            max_active_runs=0,
+            prefill_tokens_per_second=0.0,
+            env=[
+                "CONVERSATION_STORE=memory",
+                f"GAME_LIBRARY_PATH={library}",
+                f"METRICS_PORT={args.metrics_port}",
+            ],
+        )
+        print(f"{'mode':>8}{'up s':>8}{'ready s':>9}{'load s':>8}{'ttft s':>8}{'turn s':>8}  warm-up steps")
+        for mode in ("cold", "warmed"):
+            results = [boot(args, settings, mode == "warmed") for _ in range(args.boots)]
+            failed = sum(result["failed"] for result in results)
+            steps = {}
+            for result in results:
+                for step, seconds in result["timings"].items():
+                    steps.setdefault(step, []).append(seconds)
+            print(
+                f"{mode:>8}{median(results, 'up_seconds'):>8.2f}{median(results, 'ready_seconds'):>9.2f}"
+                f"{median(results, 'load_seconds'):>8.2f}{median(results, 'ttft_seconds'):>8.2f}"
+                f"{median(results, 'turn_seconds'):>8.2f}  "
+                + " ".join(f"{step}={statistics.median(values):.2f}" for step, values in steps.items())
+                + (f"  ({failed} failed)" if failed else ""),
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Runs N tool calls that each sleep for a second through ToolExecutor and reports
+# the wall time, which should stay close to one second regardless of N.
+# "queued" runs twice as many calls as there are workers: the second half
+# waits a second for a worker and must still get its full deadline. The
+# "timeout" case leaves one worker stuck on its late call.
+#
+#   python benchmarks/tool_executor_benchmark.py [--calls 8] [--timeout 1.5]
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import ToolExecutor  # noqa: E402
+
+
+def slow_lookup(seconds):
+    time.sleep(seconds)
+    return {"slept": seconds}
+
+
+async def slow_async_lookup(seconds):
+    await asyncio.sleep(seconds)
+    return {"slept": seconds}
+
+
+def tool_call(index, name, seconds):
+    return SimpleNamespace(
+        id=f"call_{index}",
+        function=SimpleNamespace(name=name, arguments=f'{{"seconds": {seconds}}}'),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=1.5)
+    args = parser.parse_args()
+
+    executor = ToolExecutor(
+        {"slow_lookup": slow_lookup, "slow_async_lookup": slow_async_lookup},
+        max_workers=args.calls,
+        default_timeout=args.timeout,
+    )
+    cases = (
+        ("sync", [tool_call(i, "slow_lookup", 1) for i in range(args.calls)]),
+        ("async", [tool_call(i, "slow_async_lookup", 1) for i in range(args.calls)]),
+        ("queued", [tool_call(i, "slow_lookup", 1) for i in range(args.calls * 2)]),
+        ("timeout", [tool_call(0, "slow_lookup", 1), tool_call(1, "slow_lookup", 5)]),
+    )
+    for label, calls in cases:
+        start = time.perf_counter()
+        outputs = executor.run(calls)
+        elapsed = time.perf_counter() - start
+        errors = sum('"error"' in output["output"] for output in outputs)
+        print(f"{label:<8} calls={len(calls):<3} wall={elapsed:.2f}s errors={errors}")
+    for name, stats in executor.stats().items():
+        print(name, {key: round(value, 3) for key, value in stats.items()})
+    print("workers", executor.workers())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import re
+
+MODES = ("full", "truncate", "summarize", "fresh")
+SUMMARY_HEADER = "Summary of the earlier conversation with this player:"
+# Tool calls are echoed into the chat log but are not thread messages
+TOOL_ENTRY = re.compile(r"### (code interpreter|Function Calling)")
+BOLD = re.compile(r"\*\*([^*\n]{2,80})\*\*")
+
+
+def clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+# Notes the app adds, such as the mark on a cut short answer, are not either
+def is_message(entry):
+    return not entry.get("note") and not TOOL_ENTRY.match(entry["msg"])
+
+
+def count_turns(entries):
+    return sum(1 for entry in entries if entry["name"] == "user")
+
+
+# Position of the first of the last `count` thread messages, where entries[0]
+# sits at position start
+def window_start(entries, start, count):
+    if count <= 0:
+        return start + len(entries)
+    seen = 0
+    for index in range(len(entries) - 1, -1, -1):
+        if is_message(entries[index]):
+            seen += 1
+            if seen == count:
+                return start + index
+    return start
+
+
+# One line per message: what the player asked and which games were suggested,
+# or the start of an answer that named none. Built from the chat log, so
+# rolling turns into the summary costs no extra run.
+def summarize(entries, limit=160):
+    lines = []
+    for entry in entries:
+        if not is_message(entry):
+            continue
+        if entry["name"] == "user":
+            lines.append(f"- Player asked: {clip(entry['msg'], limit)}")
+            continue
+        titles = list(dict.fromkeys(title.strip() for title in BOLD.findall(entry["msg"])))
+        if titles:
+            lines.append(f"  Suggested: {clip(', '.join(titles), limit)}")
+        else:
+            lines.append(f"  Answered: {clip(entry['msg'], limit)}")
+    return lines
+
+
+def summary_text(summary):
+    return f"{SUMMARY_HEADER}\n{summary}"
+
+
+# How much of a conversation each run reads. "full" leaves the whole thread to
+# the API. "truncate" sends only the last messages. "summarize" does the same
+# and rolls the messages that fall out of the window into a summary sent as
+# additional instructions. "fresh" moves the conversation to a new thread that
+# holds the summary and the last messages once it reaches fresh_after_turns.
+# Token limits apply in every mode.
+class ContextPolicy:
+    def __init__(
+        self,
+        mode="full",
+        last_messages=10,
+        max_prompt_tokens=0,
+        max_completion_tokens=0,
+        fresh_after_turns=20,
+        summary_chars=2000,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"unknown context mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.last_messages = last_messages
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.fresh_after_turns = fresh_after_turns
+        self.summary_chars = summary_chars
+
+    @property
+    def rolls_up(self):
+        return self.mode in ("summarize", "fresh")
+
+    # Keyword arguments for runs.stream and create_and_run_stream
+    def run_options(self, summary=""):
+        options = {}
+        if self.mode in ("truncate", "summarize") and self.last_messages:
+            options["truncation_strategy"] = {"type": "last_messages", "last_messages": self.last_messages}
+        if self.max_prompt_tokens:
+            options["max_prompt_tokens"] = self.max_prompt_tokens
+        if self.max_completion_tokens:
+            options["max_completion_tokens"] = self.max_completion_tokens
+        if self.mode == "summarize" and summary:
+            options["additional_instructions"] = summary_text(summary)
+        return options
+
+    # Appends lines to the summary, dropping the oldest ones beyond summary_chars
+    def extend_summary(self, summary, lines):
+        lines = (summary.splitlines() if summary else []) + lines
+        kept = []
+        size = 0
+        for line in reversed(lines):
+            size += len(line) + 1
+            if size > self.summary_chars:
+                break
+            kept.append(line)
+        return "\n".join(reversed(kept))
@@ -0,0 +1,203 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+def new_session_token():
+    return secrets.token_urlsafe(16)
+
+
+# Chat entries and thread IDs per session token. Sessions keep only recent
+# entries in memory and read older ones from here on demand, and a returning
+# browser picks its conversation back up from the token alone.
+class ConversationStore(ABC):
+    @abstractmethod
+    def get_thread_id(self, session):
+        pass
+
+    @abstractmethod
+    def set_thread_id(self, session, thread_id):
+        pass
+
+    @abstractmethod
+    def append(self, session, entries):
+        pass
+
+    @abstractmethod
+    def count(self, session):
+        pass
+
+    @abstractmethod
+    def load(self, session, start, stop):
+        pass
+
+    @abstractmethod
+    def prune(self, max_age_seconds):
+        pass
+
+    @abstractmethod
+    def stats(self):
+        pass
+
+
+class MemoryConversationStore(ConversationStore):
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, session):
+        return self._sessions.setdefault(
+            session, {"thread_id": None, "entries": [], "updated_at": time.time()}
+        )
+
+    def get_thread_id(self, session):
+        with self._lock:
+            record = self._sessions.get(session)
+            return record["thread_id"] if record else None
+
+    def set_thread_id(self, session, thread_id):
+        with self._lock:
+            record = self._session(session)
+            record["thread_id"] = thread_id
+            record["updated_at"] = time.time()
+
+    def append(self, session, entries):
+        with self._lock:
+            record = self._session(session)
+            record["entries"].extend(dict(entry) for entry in entries)
+            record["updated_at"] = time.time()
+
+    def count(self, session):
+        with self._lock:
+            record = self._sessions.get(session)
+            return len(record["entries"]) if record else 0
+
+    def load(self, session, start, stop):
+        with self._lock:
+            record = self._sessions.get(session)
+            return [dict(entry) for entry in record["entries"][start:stop]] if record else []
+
+    def prune(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            for session in [k for k, v in self._sessions.items() if v["updated_at"] < cutoff]:
+                del self._sessions[session]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "entries": sum(len(v["entries"]) for v in self._sessions.values()),
+            }
+
+
+class SQLiteConversationStore(ConversationStore):
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # One connection shared by every session; sqlite3 calls are serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session TEXT PRIMARY KEY, thread_id TEXT, updated_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "session TEXT NOT NULL, seq INTEGER NOT NULL, entry TEXT NOT NULL, "
+                "PRIMARY KEY (session, seq)) WITHOUT ROWID"
+            )
+
+    def _touch(self, session, thread_id=None):
+        self._db.execute(
+            "INSERT INTO sessions (session, thread_id, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (session) DO UPDATE SET updated_at = excluded.updated_at, "
+            "thread_id = COALESCE(excluded.thread_id, sessions.thread_id)",
+            (session, thread_id, time.time()),
+        )
+
+    def get_thread_id(self, session):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT thread_id FROM sessions WHERE session = ?", (session,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_thread_id(self, session, thread_id):
+        with self._lock:
+            self._touch(session, thread_id)
+
+    def append(self, session, entries):
+        rows = [json.dumps(entry) for entry in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._touch(session)
+                (start,) = self._db.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM entries WHERE session = ?", (session,)
+                ).fetchone()
+                self._db.executemany(
+                    "INSERT INTO entries (session, seq, entry) VALUES (?, ?, ?)",
+                    [(session, start + i, row) for i, row in enumerate(rows)],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def count(self, session):
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM entries WHERE session = ?", (session,)
+            ).fetchone()
+        return count
+
+    def load(self, session, start, stop):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT entry FROM entries WHERE session = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session, start, stop),
+            ).fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def prune(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "DELETE FROM entries WHERE session IN "
+                    "(SELECT session FROM sessions WHERE updated_at < ?)",
+                    (cutoff,),
+                )
+                self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            (sessions,) = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": sessions, "entries": entries}
+
+
+# CONVERSATION_STORE="sqlite:///path/to.db" (default) or "memory"
+def open_store(url):
+    if url == "memory":
+        return MemoryConversationStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteConversationStore(url[len("sqlite:///"):])
+    raise ValueError(f"unsupported CONVERSATION_STORE: {url}")
@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+FORMAT_VERSION = 1
+REDACTED = "[redacted]"
+# Credentials wherever they appear in a string, and any string field named like one
+SECRET_TEXT = re.compile(r"\b(?:sk|rk)-[A-Za-z0-9_-]{16,}|\bBearer\s+[A-Za-z0-9._~+/=-]+")
+SECRET_FIELD = re.compile(r"api_?key|authorization|password|secret|token", re.I)
+
+
+def redact(value, secrets=()):
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(item, str) and SECRET_FIELD.search(key) else redact(item, secrets)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item, secrets) for item in value]
+    if isinstance(value, str):
+        for secret in secrets:
+            value = value.replace(secret, REDACTED)
+        return SECRET_TEXT.sub(REDACTED, value)
+    return value
+
+
+# The events of one turn, held in memory until the turn ends. Each stream the
+# turn reads (the run, then one per tool output submission or resumed run) is
+# a segment; an event's offset is seconds since its segment's request was made.
+class Recording:
+    def __init__(self, header):
+        self.header = header
+        self.started_at = time.monotonic()
+        self.segments = []
+
+    def open_segment(self):
+        self.segments.append((time.monotonic(), []))
+        return len(self.segments) - 1
+
+    # Serialized on arrival: the SDK accumulates later deltas into the objects
+    # of created events, so a kept reference would not hold what was sent
+    def add(self, segment, event):
+        opened_at, events = self.segments[segment]
+        events.append((time.monotonic() - opened_at, event.event, event.data.to_dict(mode="json")))
+
+    @property
+    def events(self):
+        return sum(len(events) for _, events in self.segments)
+
+
+# Writes the raw event streams of sampled turns to gzipped JSON lines, for
+# replaying through the EventHandler (benchmarks/replay_benchmark.py). Failed
+# turns and turns slower than slow_seconds are always kept. The first line is
+# the header (question, assistant, outcome); then one line per event:
+# {"segment", "t", "event", "data"}, with secrets redacted.
+class EventRecorder:
+    def __init__(self, directory, sample_rate=1.0, slow_seconds=0.0, secrets=()):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        # Short values would match inside ordinary IDs and text
+        self.secrets = [secret for secret in secrets if secret and len(secret) >= 8]
+        self.saved = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, assistant_id, kind, question):
+        return Recording({"assistant_id": assistant_id, "kind": kind, "question": question})
+
+    def keep(self, outcome, seconds):
+        if outcome != "ok":
+            return True
+        if self.slow_seconds and seconds >= self.slow_seconds:
+            return True
+        return random.random() < self.sample_rate
+
+    # Returns the file written, or None when the turn was not sampled
+    def save(self, recording, outcome, run_id=None):
+        seconds = time.monotonic() - recording.started_at
+        if not recording.segments or not self.keep(outcome, seconds):
+            with self._lock:
+                self.skipped += 1
+            return None
+        recorded_at = datetime.now(timezone.utc)
+        header = {
+            "version": FORMAT_VERSION,
+            "recorded_at": recorded_at.isoformat(timespec="seconds"),
+            **recording.header,
+            "outcome": outcome,
+            "seconds": round(seconds, 4),
+            "segments": len(recording.segments),
+            "events": recording.events,
+        }
+        suffix = run_id or f"{random.getrandbits(32):08x}"
+        path = os.path.join(self.directory, f"{recorded_at:%Y%m%dT%H%M%S}-{outcome}-{suffix}.jsonl.gz")
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".recording-")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                f.write(json.dumps(redact(header, self.secrets)) + "\n")
+                for segment, (_, events) in enumerate(recording.segments):
+                    for offset, event, data in events:
+                        data = redact(data, self.secrets)
+                        line = {"segment": segment, "t": round(offset, 4), "event": event, "data": data}
+                        f.write(json.dumps(line) + "\n")
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self.saved += 1
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {"directory": self.directory, "saved": self.saved, "skipped": self.skipped}
+
+
+# Returns (header, segments) where each segment is a list of (offset, event, data)
+def read_recording(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        segments = [[] for _ in range(header["segments"])]
+        for line in f:
+            event = json.loads(line)
+            segments[event["segment"]].append((event["t"], event["event"], event["data"]))
+    return header, segments
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Streamlit static serving answers 404 for larger files
+MAX_STATIC_FILE_BYTES = 200 * 1024 * 1024
+# mkstemp creates files readable by their owner only; whoever serves or copies them may be another user
+FILE_MODE = 0o644
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+# Content-addressed store for files produced by the assistant. Downloads are
+# streamed to disk in chunks and the files are served by Streamlit static
+# serving, so chat messages only keep a short link. A file larger than static
+# serving sends raises FileTooLarge as soon as the download passes the limit.
+class FileCache:
+    def __init__(self, directory, url_prefix, max_bytes, chunk_size=64 * 1024, max_file_bytes=MAX_STATIC_FILE_BYTES):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.chunk_size = chunk_size
+        self._blobs = OrderedDict()
+        self._file_ids = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        # Files left by an earlier process count towards the size bound, oldest first
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path) and not name.startswith("."):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._blobs[name] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._blobs) > 1:
+            name, size = self._blobs.popitem(last=False)
+            self._total_bytes -= size
+            for file_id in [k for k, v in self._file_ids.items() if v == name]:
+                del self._file_ids[file_id]
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def url(self, name):
+        return f"{self.url_prefix}/{name}"
+
+    def fetch(self, client, file_id, file_name):
+        with self._lock:
+            name = self._file_ids.get(file_id)
+            if name is not None:
+                self._blobs.move_to_end(name)
+                return self.url(name)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".download-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with client.files.with_streaming_response.content(file_id) as response:
+                    for chunk in response.iter_bytes(self.chunk_size):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+                        if size > self.max_file_bytes:
+                            raise FileTooLarge(f"{file_name} is over {self.max_file_bytes} bytes")
+            os.chmod(temp_path, FILE_MODE)
+            name = digest.hexdigest()[:32] + os.path.splitext(file_name)[1].lower()
+            os.replace(temp_path, os.path.join(self.directory, name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            if name not in self._blobs:
+                self._blobs[name] = size
+                self._total_bytes += size
+            self._blobs.move_to_end(name)
+            self._file_ids[file_id] = name
+            self._evict()
+        return self.url(name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._blobs),
+                "file_ids": len(self._file_ids),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
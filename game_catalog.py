@@ -0,0 +1,194 @@
+import csv
+import heapq
+import json
+import os
+import random
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+# CSV or JSON file with one game per row/object. Columns: name, min_players,
+# max_players, best_players ("3" or "3,4"), rating, weight, play_time (minutes)
+GAME_LIBRARY_PATH = os.environ.get("GAME_LIBRARY_PATH", os.path.join("data", "games.csv"))
+# Player counts above this share the last index bucket
+MAX_INDEXED_PLAYERS = 12
+MAX_RESULTS = 25
+
+
+def read_rows(path):
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+        return rows["games"] if isinstance(rows, dict) else rows
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def parse_counts(value):
+    if isinstance(value, (int, float)):
+        return [int(value)]
+    if isinstance(value, list):
+        return [int(v) for v in value]
+    return [int(v) for v in str(value or "").replace(";", ",").split(",") if v.strip()]
+
+
+def player_bucket(count):
+    return max(1, min(int(count), MAX_INDEXED_PLAYERS))
+
+
+def compact(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+# Columnar in-memory index over the game library. Every per-player-count list
+# is pre-sorted by rating, so the usual "top games for N players" lookup is a
+# slice; rating, weight and play time ranges are answered with bisect.
+class GameCatalog:
+    def __init__(self, rows):
+        games = []
+        for row in rows:
+            name = str(row.get("name") or "").strip()
+            if not name:
+                continue
+            min_players = int(row.get("min_players") or 1)
+            games.append((
+                name,
+                min_players,
+                int(row.get("max_players") or min_players),
+                parse_counts(row.get("best_players")),
+                float(row.get("rating") or 0),
+                float(row.get("weight") or 0),
+                int(float(row.get("play_time") or 0)),
+            ))
+        # Game IDs are positions in rating order, so sorting IDs sorts by rating
+        games.sort(key=lambda game: -game[4])
+        self.names = [game[0] for game in games]
+        self.min_players = array("H", (game[1] for game in games))
+        self.max_players = array("H", (game[2] for game in games))
+        self.best_players = [tuple(game[3]) for game in games]
+        self.rating = array("d", (game[4] for game in games))
+        self.weight = array("d", (game[5] for game in games))
+        self.play_time = array("H", (min(game[6], 65535) for game in games))
+
+        self.by_name = {name.casefold(): i for i, name in reversed(list(enumerate(self.names)))}
+        self.by_players = {n: array("I") for n in range(1, MAX_INDEXED_PLAYERS + 1)}
+        self.by_best_players = {n: array("I") for n in range(1, MAX_INDEXED_PLAYERS + 1)}
+        for i in range(len(games)):
+            low = player_bucket(self.min_players[i])
+            high = player_bucket(self.max_players[i])
+            for n in range(low, high + 1):
+                self.by_players[n].append(i)
+            for n in sorted({player_bucket(count) for count in self.best_players[i]}):
+                self.by_best_players[n].append(i)
+        self.all_games = array("I", range(len(games)))
+        self._negated_rating = array("d", (-rating for rating in self.rating))
+        self._ranges = {}
+        for field in ("weight", "play_time"):
+            values = getattr(self, field)
+            order = sorted(range(len(games)), key=values.__getitem__)
+            self._ranges[field] = (array("d", (values[i] for i in order)), array("I", order))
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_rows(path))
+
+    def __len__(self):
+        return len(self.names)
+
+    def describe(self, i):
+        low, high = self.min_players[i], self.max_players[i]
+        return {
+            "name": self.names[i],
+            "players": f"{low}-{high}" if high != low else str(low),
+            "best": list(self.best_players[i]),
+            "rating": round(self.rating[i], 2),
+            "weight": round(self.weight[i], 2),
+            "minutes": self.play_time[i],
+        }
+
+    def _range_ids(self, field, low, high):
+        values, ids = self._ranges[field]
+        start = 0 if low is None else bisect_left(values, low)
+        stop = len(values) if high is None else bisect_right(values, high)
+        return ids[start:stop]
+
+    def find(
+        self,
+        players=None,
+        best_players=None,
+        min_rating=None,
+        min_weight=None,
+        max_weight=None,
+        max_play_time=None,
+        limit=10,
+    ):
+        limit = max(1, min(int(limit), MAX_RESULTS))
+        # Candidate pools are supersets of the answer; the smallest one is
+        # filtered with the exact checks
+        ranked = [self.all_games]
+        ranged = []
+        checks = []
+        if players is not None:
+            players = int(players)
+            ranked.append(self.by_players[player_bucket(players)])
+            checks.append(lambda i: self.min_players[i] <= players <= self.max_players[i])
+        if best_players is not None:
+            best_players = int(best_players)
+            ranked.append(self.by_best_players[player_bucket(best_players)])
+            checks.append(lambda i: best_players in self.best_players[i])
+        # IDs are in rating order, so a rating floor is an ID ceiling
+        cutoff = len(self) if min_rating is None else bisect_right(self._negated_rating, -float(min_rating))
+        if min_weight is not None or max_weight is not None:
+            low = 0.0 if min_weight is None else float(min_weight)
+            high = float("inf") if max_weight is None else float(max_weight)
+            ranged.append(self._range_ids("weight", low, high))
+            checks.append(lambda i: low <= self.weight[i] <= high)
+        if max_play_time is not None:
+            max_play_time = int(max_play_time)
+            ranged.append(self._range_ids("play_time", None, max_play_time))
+            checks.append(lambda i: self.play_time[i] <= max_play_time)
+
+        def matches(i):
+            return all(check(i) for check in checks)
+
+        pool = min(ranked, key=len)
+        walk = min(len(pool), cutoff)
+        narrowest = min(ranged, key=len, default=None)
+        if narrowest is not None and len(narrowest):
+            # A walk in rating order stops after roughly limit / selectivity games
+            walk = min(walk, (limit + 1) * len(self) / len(narrowest))
+        if narrowest is not None and len(narrowest) < walk:
+            found = heapq.nsmallest(limit + 1, (i for i in narrowest if i < cutoff and matches(i)))
+        else:
+            found = []
+            for i in pool:
+                if i >= cutoff:
+                    break
+                if matches(i):
+                    found.append(i)
+                    if len(found) > limit:
+                        break
+        return [self.describe(i) for i in found[:limit]], len(found) > limit
+
+    def get(self, name):
+        i = self.by_name.get(name.strip().casefold())
+        return None if i is None else self.describe(i)
+
+    def sample(self, count, rng=random):
+        count = max(1, min(int(count), MAX_RESULTS, len(self)))
+        return [self.describe(i) for i in rng.sample(range(len(self)), count)]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+# Loaded on the first tool call and kept for the life of the process, so
+# Streamlit reruns and sessions share one index
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = GameCatalog.load(GAME_LIBRARY_PATH)
+    return _catalog
@@ -0,0 +1,359 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+TOKEN_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROMPT_TOKEN_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+LOOKUP_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+# Optional JSONL log with one line per traced run, for offline analysis
+trace_log_path = os.environ.get("TRACE_LOG_PATH")
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, count, total) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{format_labels(key, le=bound)} {bucket_count}")
+                lines.append(f"{self.name}_bucket{format_labels(key, le='+Inf')} {count}")
+                lines.append(f"{self.name}_count{format_labels(key)} {count}")
+                lines.append(f"{self.name}_sum{format_labels(key)} {total}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{format_labels(key)} {value}")
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+PHASE_SECONDS = register(Histogram(
+    "assistant_phase_seconds",
+    "Time spent in each phase of a run (create_thread, create_message, queue, first_text)",
+))
+TTFT_SECONDS = register(Histogram(
+    "assistant_ttft_seconds",
+    "Time from the user's request to the first streamed token, by kind (chat, or a starter_cache/question_cache replay)",
+))
+RUN_SECONDS = register(Histogram(
+    "assistant_run_seconds", "Total time from the user's request to the end of the run, by kind"
+))
+TOOL_SECONDS = register(Histogram(
+    "assistant_tool_seconds", "Function tool execution time"
+))
+TOKENS_STREAMED = register(Histogram(
+    "assistant_tokens_streamed", "Text deltas streamed per run", TOKEN_BUCKETS
+))
+PROMPT_TOKENS = register(Histogram(
+    "assistant_prompt_tokens", "Prompt tokens billed per turn, when the API reports usage", PROMPT_TOKEN_BUCKETS
+))
+SCRIPT_RUN_SECONDS = register(Histogram(
+    "streamlit_script_run_seconds", "Duration of a Streamlit script run, including reruns"
+))
+RUNS_TOTAL = register(Counter("assistant_runs_total", "Runs by outcome"))
+ERRORS_TOTAL = register(Counter("assistant_errors_total", "Errors by stage"))
+TOOL_CALLS_TOTAL = register(Counter("assistant_tool_calls_total", "Function tool calls by outcome"))
+TOOL_WORKERS_STUCK = register(Gauge(
+    "assistant_tool_workers_stuck", "Tool threads still running a call that missed its deadline"
+))
+RUNS_CANCELLED_TOTAL = register(Counter(
+    "assistant_runs_cancelled_total", "Runs cancelled by reason (interrupted, idle, max_age, replaced, error)"
+))
+ADMISSION_WAIT_SECONDS = register(Histogram(
+    "assistant_admission_wait_seconds", "Time a turn waited in the queue before its run could start"
+))
+ADMISSION_QUEUE_DEPTH = register(Gauge("assistant_admission_queue_depth", "Turns waiting for a run slot"))
+ADMISSION_RUNNING = register(Gauge("assistant_admission_running", "Runs holding a slot"))
+QUESTION_CACHE_TOTAL = register(Counter("assistant_question_cache_total", "Question cache lookups by outcome"))
+QUESTION_CACHE_LOOKUP_SECONDS = register(Histogram(
+    "assistant_question_cache_lookup_seconds", "Time to match a question against the question cache", LOOKUP_BUCKETS
+))
+THREAD_POOL_TOTAL = register(Counter("assistant_warm_thread_pool_total", "Warm thread pool hits and misses"))
+HTTP_REQUESTS_TOTAL = register(Counter("openai_http_requests_total", "HTTP requests sent to the OpenAI API"))
+HTTP_CONNECTIONS_TOTAL = register(Counter(
+    "openai_http_connections_total", "New TCP connections to the OpenAI API; the rest reused a pooled one"
+))
+STARTUP_SECONDS = register(Gauge(
+    "assistant_startup_seconds", "Time each startup step took (imports, connections, assistant:<id>, tools, total)"
+))
+READY = register(Gauge("assistant_ready", "1 once startup finished without a fatal problem"))
+STARTUP_WARNINGS = register(Gauge(
+    "assistant_startup_warnings", "Startup problems that leave the app usable, such as functions missing from TOOL_MAP"
+))
+OPENAI_RETRIES_TOTAL = register(Counter(
+    "openai_retries_total", "Retries of failed requests (layer=request) and of transient run failures (layer=run)"
+))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def observe_tool(name, seconds, outcome):
+    TOOL_SECONDS.observe(seconds, tool=name)
+    TOOL_CALLS_TOTAL.inc(tool=name, outcome=outcome)
+
+
+def observe_stuck_tools(count):
+    TOOL_WORKERS_STUCK.set(count)
+
+
+def observe_queue(assistant_id, waiting, running):
+    ADMISSION_QUEUE_DEPTH.set(waiting, assistant_id=assistant_id or "")
+    ADMISSION_RUNNING.set(running, assistant_id=assistant_id or "")
+
+
+def observe_admission(assistant_id, seconds):
+    ADMISSION_WAIT_SECONDS.observe(seconds, assistant_id=assistant_id or "")
+
+
+def observe_question_cache(outcome, seconds):
+    QUESTION_CACHE_TOTAL.inc(outcome=outcome)
+    QUESTION_CACHE_LOOKUP_SECONDS.observe(seconds)
+
+
+# Trace of one user turn. Marks are monotonic offsets from the start so the
+# per-delta path only bumps a counter.
+class RunTrace:
+    _log_lock = threading.Lock()
+
+    def __init__(self, assistant_id, kind="chat"):
+        self.assistant_id = assistant_id
+        self.kind = kind
+        self.started_at = time.monotonic()
+        self.wall_started_at = time.time()
+        self.marks = {}
+        self.thread_id = None
+        self.run_id = None
+        self.run_status = None
+        self.run_error_code = None
+        self.message_ids = []
+        self.deltas = 0
+        self.tools = []
+        self.error = None
+        # Tokens billed for the turn's runs, when the API reports usage
+        self.usage_tokens = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.outcome = None
+        # The turn's raw events, when EVENT_RECORD_DIR is set
+        self.recording = None
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = time.monotonic() - self.started_at
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def add_usage(self, usage):
+        self.usage_tokens = (self.usage_tokens or 0) + usage.total_tokens
+        self.prompt_tokens = (self.prompt_tokens or 0) + usage.prompt_tokens
+        self.completion_tokens = (self.completion_tokens or 0) + usage.completion_tokens
+
+    def finish(self, outcome):
+        self.outcome = outcome
+        total = time.monotonic() - self.started_at
+        labels = {"assistant_id": self.assistant_id or ""}
+        marks = self.marks
+        for phase in ("create_thread", "create_message"):
+            if f"{phase}_end" in marks:
+                PHASE_SECONDS.observe(marks[f"{phase}_end"] - marks[f"{phase}_start"], phase=phase, **labels)
+        if "stream_start" in marks and "in_progress" in marks:
+            PHASE_SECONDS.observe(marks["in_progress"] - marks["stream_start"], phase="queue", **labels)
+        if "stream_start" in marks and "text_created" in marks:
+            PHASE_SECONDS.observe(marks["text_created"] - marks["stream_start"], phase="first_text", **labels)
+        if "first_delta" in marks:
+            # Cache replays answer at once; kind keeps them apart from real runs
+            TTFT_SECONDS.observe(marks["first_delta"], kind=self.kind, **labels)
+        RUN_SECONDS.observe(total, kind=self.kind, **labels)
+        TOKENS_STREAMED.observe(self.deltas, **labels)
+        if self.prompt_tokens is not None:
+            PROMPT_TOKENS.observe(self.prompt_tokens, **labels)
+        RUNS_TOTAL.inc(outcome=outcome, kind=self.kind, **labels)
+        if outcome == "error":
+            ERRORS_TOTAL.inc(stage=self.error or "unknown", **labels)
+        if trace_log_path:
+            self._write(total, outcome)
+
+    def _write(self, total, outcome):
+        record = {
+            "ts": self.wall_started_at,
+            "assistant_id": self.assistant_id,
+            "kind": self.kind,
+            "thread_id": self.thread_id,
+            "run_id": self.run_id,
+            "run_status": self.run_status,
+            "outcome": outcome,
+            "error": self.error,
+            "total_seconds": round(total, 4),
+            "marks": {k: round(v, 4) for k, v in self.marks.items()},
+            "deltas": self.deltas,
+            "usage_tokens": self.usage_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tools": self.tools,
+        }
+        with self._log_lock, open(trace_log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+class _Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.trace.mark(f"{self.name}_start")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.mark(f"{self.name}_end")
+        if exc_type is not None and self.trace.error is None:
+            self.trace.error = self.name
+        return False
+
+
+# Returns (ready, details) for /ready; set once the app starts its startup phase
+_readiness = None
+
+
+def set_readiness(check):
+    global _readiness
+    _readiness = check
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/ready":
+            self._send_ready()
+            return
+        if path != "/metrics":
+            self.send_error(404)
+            return
+        payload = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_ready(self):
+        ready, details = _readiness() if _readiness is not None else (False, {"ready": False, "finished": False})
+        payload = json.dumps(details).encode()
+        self.send_response(200 if ready else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="0.0.0.0"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_push_loop(url, interval_seconds):
+    # Pushgateway style: PUT the exposition text to e.g. http://gateway:9091/metrics/job/diversions-bot
+    def push():
+        while True:
+            time.sleep(interval_seconds)
+            request = urllib.request.Request(
+                url, data=render().encode(), method="PUT",
+                headers={"Content-Type": "text/plain; version=0.0.4"},
+            )
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except OSError:
+                ERRORS_TOTAL.inc(stage="metrics_push")
+
+    thread = threading.Thread(target=push, name="metrics-push", daemon=True)
+    thread.start()
+    return thread
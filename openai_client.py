@@ -0,0 +1,79 @@
+import logging
+import random
+
+import httpx
+import openai
+
+from metrics import HTTP_CONNECTIONS_TOTAL, HTTP_REQUESTS_TOTAL, OPENAI_RETRIES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying on a run that already failed server side
+TRANSIENT_RUN_ERRORS = {"rate_limit_exceeded", "server_error"}
+
+
+def _trace_connection(event_name, info):
+    # httpcore reports every new TCP connection; requests without one reused a pooled connection
+    if event_name == "connection.connect_tcp.complete":
+        HTTP_CONNECTIONS_TOTAL.inc()
+        logger.debug("opened connection to the OpenAI API")
+
+
+def _on_request(request):
+    request.extensions["trace"] = _trace_connection
+    HTTP_REQUESTS_TOTAL.inc()
+    retries_taken = int(request.headers.get("x-stainless-retry-count", 0))
+    if retries_taken:
+        OPENAI_RETRIES_TOTAL.inc(layer="request")
+        logger.warning("retry %d of %s %s", retries_taken, request.method, request.url.path)
+
+
+def _on_response(response):
+    if response.status_code == 429 or response.status_code >= 500:
+        logger.warning("%s %s returned %d", response.request.method, response.request.url.path, response.status_code)
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_client(
+    api_key,
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30.0,
+    http2=False,
+    timeout=60.0,
+    connect_timeout=5.0,
+    max_retries=3,
+):
+    if http2 and not http2_available():
+        logger.warning("OPENAI_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        http2=http2,
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+    # The SDK retries 408/409/429/5xx and connection errors with jittered exponential backoff
+    return openai.OpenAI(api_key=api_key, http_client=http_client, max_retries=max_retries)
+
+
+def is_transient(error):
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, httpx.TransportError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def backoff_seconds(attempt, base=0.5, cap=8.0):
+    # Full jitter: uniform in [0, min(cap, base * 2**attempt)]
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,245 @@
+import heapq
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict, deque
+
+NUMBER_WORDS = {
+    "one": "1", "solo": "1", "single": "1", "two": "2", "couple": "2", "pair": "2", "three": "3",
+    "four": "4", "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+}
+SYNONYMS = {"people": "player", "person": "player", "persons": "player", "friends": "player"}
+# Filler that does not change what is being asked; the ranking adjectives all
+# ask for the top-rated games
+STOPWORDS = set(
+    "a an the for of to with and or in on at some any me my i you your we us our can could would "
+    "please what which whats are is do does there recommend suggest show give tell list find get "
+    "good great best top fun nice really very most highly rated".split()
+)
+# Words that turn a question into its opposite; trigrams give them almost no
+# weight, so whether a question has one is part of its scope like its numbers
+NEGATIONS = {"no", "not", "non", "without", "except", "excluding", "never", "dont", "don", "avoid"}
+NGRAM = 3
+# 8 bands of 3 MinHash rows: questions sharing 70% of their trigrams meet in
+# some band 96% of the time, ones sharing 20% under 7% of the time
+BANDS = 8
+ROWS = 3
+MAX_CANDIDATES = 8
+# A bucket this full holds many wordings of one template; counting it costs
+# more than it tells apart, so lookups skip it and rely on the other bands
+BUCKET_LIMIT = 256
+MASK = (1 << 61) - 1
+
+
+def normalize(question):
+    text = unicodedata.normalize("NFKD", question).casefold()
+    text = re.sub(r"(\d+)\s*-?\s*(?:p|players?)\b", r"\1 player", text)
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        word = NUMBER_WORDS.get(word, SYNONYMS.get(word, word))
+        if word in STOPWORDS or (len(word) == 1 and not word.isdigit()):
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+def ngrams(normalized):
+    # Trigrams of each padded word, so word order does not matter
+    grams = Counter()
+    for word in normalized.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1)))
+    return grams
+
+
+_rng = random.Random(61)
+_PERMUTATIONS = [(_rng.randrange(1, MASK), _rng.randrange(MASK)) for _ in range(BANDS * ROWS)]
+
+
+def band_keys(grams):
+    hashes = [hash(gram) & MASK for gram in grams]
+    signature = [min((a * h + b) & MASK for h in hashes) for a, b in _PERMUTATIONS]
+    return [(band, *signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+class _Entry:
+    __slots__ = ("assistant_id", "question", "normalized", "grams", "keys", "messages", "run_seconds", "stored_at")
+
+
+# Answers to first-turn questions, matched to new questions that are worded
+# differently but ask the same thing. Questions are compared by the cosine of
+# their character-trigram TF-IDF vectors; MinHash LSH buckets keep a lookup to
+# a handful of candidates however many answers are cached. Numbers in a
+# question must match exactly, so "3 players" never gets the "2 players"
+# answer, and a negated question only matches another negated one.
+class QuestionCache:
+    def __init__(self, threshold=0.85, ttl_seconds=3600, max_entries=10000, sample_rate=0.05, listener=None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.sample_rate = sample_rate
+        self.listener = listener
+        self._entries = OrderedDict()
+        self._exact = {}
+        self._buckets = {}
+        self._df = Counter()
+        self._ids = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+        self.max_lookup_seconds = 0.0
+        # Recent hits for review: (question, cached question, score)
+        self.samples = deque(maxlen=50)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _scope(assistant_id, normalized):
+        words = normalized.split()
+        return (
+            assistant_id,
+            tuple(word for word in words if word.isdigit()),
+            any(word in NEGATIONS for word in words),
+        )
+
+    def _idf(self, gram):
+        return math.log((1 + len(self._entries)) / (1 + self._df[gram])) + 1
+
+    def _similarity(self, weights, norm, entry, idf):
+        dot = 0.0
+        other = 0.0
+        for gram, count in entry.grams.items():
+            weight = idf.get(gram)
+            if weight is None:
+                weight = idf[gram] = self._idf(gram)
+            weight *= count
+            other += weight * weight
+            if gram in weights:
+                dot += weights[gram] * weight
+        return dot / (norm * math.sqrt(other)) if norm and other else 0.0
+
+    def _expired(self, entry, now):
+        return now - entry.stored_at > self.ttl_seconds
+
+    # Returns (messages, cached question, score) for the closest cached
+    # question above the threshold, or None
+    def get(self, assistant_id, question):
+        started = time.perf_counter()
+        normalized = normalize(question)
+        scope = self._scope(assistant_id, normalized)
+        grams = ngrams(normalized)
+        keys = band_keys(grams) if grams else []
+        now = time.monotonic()
+        with self._lock:
+            match = None
+            entry_id = self._exact.get((scope, normalized))
+            if entry_id is not None:
+                match = (entry_id, 1.0)
+            elif keys:
+                collisions = Counter()
+                for key in keys:
+                    bucket = self._buckets.get((scope, key), ())
+                    if len(bucket) <= BUCKET_LIMIT:
+                        collisions.update(bucket)
+                idf = {gram: self._idf(gram) for gram in grams}
+                weights = {gram: count * idf[gram] for gram, count in grams.items()}
+                norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+                for candidate, _ in heapq.nlargest(MAX_CANDIDATES, collisions.items(), key=lambda item: item[1]):
+                    score = self._similarity(weights, norm, self._entries[candidate], idf)
+                    if score >= self.threshold and (match is None or score > match[1]):
+                        match = (candidate, score)
+            result = None
+            if match is not None:
+                entry = self._entries[match[0]]
+                if self._expired(entry, now):
+                    self._remove(match[0])
+                else:
+                    self._entries.move_to_end(match[0])
+                    result = (entry.messages, entry.question, match[1])
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_seconds += entry.run_seconds
+                if random.random() < self.sample_rate:
+                    self.samples.append((question, entry.question, round(match[1], 3)))
+            seconds = time.perf_counter() - started
+            self.lookup_seconds += seconds
+            self.max_lookup_seconds = max(self.max_lookup_seconds, seconds)
+        if self.listener is not None:
+            self.listener("hit" if result else "miss", seconds)
+        return result
+
+    def set(self, assistant_id, question, messages, run_seconds=0.0):
+        if not messages:
+            return
+        normalized = normalize(question)
+        grams = ngrams(normalized)
+        if not grams:
+            return
+        entry = _Entry()
+        entry.assistant_id = assistant_id
+        entry.question = question
+        entry.normalized = normalized
+        entry.grams = grams
+        entry.keys = band_keys(grams)
+        entry.messages = list(messages)
+        entry.run_seconds = run_seconds
+        entry.stored_at = time.monotonic()
+        scope = self._scope(assistant_id, normalized)
+        with self._lock:
+            previous = self._exact.get((scope, normalized))
+            if previous is not None:
+                self._remove(previous)
+            self._ids += 1
+            entry_id = self._ids
+            self._entries[entry_id] = entry
+            self._exact[(scope, normalized)] = entry_id
+            for key in entry.keys:
+                self._buckets.setdefault((scope, key), set()).add(entry_id)
+            self._df.update(grams.keys())
+            # Least recently used first; expired answers at the front go too
+            while self._entries:
+                oldest_id = next(iter(self._entries))
+                if len(self._entries) <= self.max_entries and not self._expired(self._entries[oldest_id], entry.stored_at):
+                    break
+                self._remove(oldest_id)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        scope = self._scope(entry.assistant_id, entry.normalized)
+        self._exact.pop((scope, entry.normalized), None)
+        for key in entry.keys:
+            bucket = self._buckets.get((scope, key))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[(scope, key)]
+        self._df.subtract(entry.grams.keys())
+
+    def invalidate(self, assistant_id=None):
+        with self._lock:
+            for entry_id in [i for i, e in self._entries.items() if assistant_id in (None, e.assistant_id)]:
+                self._remove(entry_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+                "mean_lookup_ms": round(self.lookup_seconds / lookups * 1000, 3) if lookups else 0.0,
+                "max_lookup_ms": round(self.max_lookup_seconds * 1000, 3),
+                "sampled_hits": list(self.samples),
+            }
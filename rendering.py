@@ -0,0 +1,77 @@
+import os
+import re
+import time
+
+LINK_PATTERN = re.compile(r"\[(.*?)\]\s*\(\s*(.*?)\s*\)")
+
+# Streamed text is flushed to the page at most every RENDER_INTERVAL_MS,
+# or sooner once RENDER_MIN_CHARS characters are waiting
+RENDER_INTERVAL = float(os.environ.get("RENDER_INTERVAL_MS", 50)) / 1000
+RENDER_MIN_CHARS = int(os.environ.get("RENDER_MIN_CHARS", 400))
+
+# An unfinished link longer than this is shown as-is instead of held back
+MAX_PENDING_LINK = 500
+
+
+def rewrite_links(text):
+    return LINK_PATTERN.sub("Download Link", text)
+
+
+def split_pending_link(text):
+    # Links never span lines, so only an open "[" on the last line can still grow into one
+    start = text.rfind("[")
+    if start == -1 or "\n" in text[start:] or len(text) - start > MAX_PENDING_LINK:
+        return text, ""
+    return text[:start], text[start:]
+
+
+class StreamRenderer:
+    def __init__(
+        self,
+        placeholder,
+        template="{}",
+        rewrite=None,
+        interval=RENDER_INTERVAL,
+        min_chars=RENDER_MIN_CHARS,
+        clock=time.monotonic,
+    ):
+        self.placeholder = placeholder
+        self.template = template
+        self.rewrite = rewrite
+        self.interval = interval
+        self.min_chars = min_chars
+        self.clock = clock
+        self.rendered = ""
+        self.pending = ""
+        self.unflushed = 0
+        self.last_flush = None
+        self.updates = 0
+
+    def append(self, text):
+        self.pending += text
+        self.unflushed += len(text)
+        if (
+            self.last_flush is None
+            or self.unflushed >= self.min_chars
+            or self.clock() - self.last_flush >= self.interval
+        ):
+            self.flush()
+
+    def flush(self, final=False):
+        if not self.unflushed and not final:
+            return
+        ready, held = self.pending, ""
+        if self.rewrite:
+            if not final:
+                ready, held = split_pending_link(ready)
+            ready = self.rewrite(ready)
+        self.rendered += ready
+        self.pending = held
+        self.unflushed = 0
+        self.last_flush = self.clock()
+        self.updates += 1
+        self.placeholder.markdown(self.template.format(self.rendered + held), True)
+
+    @property
+    def text(self):
+        return self.rendered + self.pending
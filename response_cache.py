@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# In-process cache of finished assistant answers keyed by (assistant_id, prompt)
+class ResponseCache:
+    def __init__(self, ttl_seconds=3600, max_entries=128):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def get(self, assistant_id, prompt):
+        key = (assistant_id, prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry["run_seconds"]
+            return entry["messages"]
+
+    def set(self, assistant_id, prompt, messages, run_seconds=0.0):
+        if not messages:
+            return
+        key = (assistant_id, prompt)
+        with self._lock:
+            self._entries[key] = {
+                "messages": list(messages),
+                "run_seconds": run_seconds,
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, assistant_id=None):
+        with self._lock:
+            if assistant_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == assistant_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+                "saved_runs": self.hits,
+            }
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from openai_client import is_transient
+
+logger = logging.getLogger(__name__)
+
+# Answers that retrying will not change
+FATAL_ERRORS = (openai.NotFoundError, openai.AuthenticationError, openai.PermissionDeniedError, openai.BadRequestError)
+
+
+# Work done once per process before it takes traffic. Every configured
+# assistant is retrieved in parallel, along with extra requests so the pool
+# holds `connections` open connections. The assistants' function tools are
+# checked against the tool map, and the data the tools read is loaded. It runs
+# in the background, so the first session is not held up. Only the assistants
+# in `required` are served; ready is set once each of them was retrieved
+# without a fatal problem (a bad ID or key), and those that could not be
+# reached are retried every retry_seconds. Anything else that goes wrong is a
+# warning: the other assistants are only warmed and checked, and a declared
+# function with no implementation only fails calls to it.
+class Startup:
+    def __init__(
+        self,
+        client,
+        assistant_ids,
+        tool_map,
+        required=(),
+        preload=None,
+        connections=4,
+        retry_seconds=30,
+        import_seconds=None,
+        on_timing=None,
+        on_problem=None,
+        on_warning=None,
+        on_finish=None,
+    ):
+        self.client = client
+        self.assistant_ids = list(dict.fromkeys(assistant_ids))
+        self.tool_map = tool_map
+        self.required = set(required)
+        self.preload = preload
+        self.connections = connections
+        self.retry_seconds = retry_seconds
+        self.on_timing = on_timing
+        self.on_problem = on_problem
+        self.on_warning = on_warning
+        self.on_finish = on_finish
+        self.assistants = {}
+        self.timings = {}
+        self.problems = {}
+        self.warnings = []
+        self.attempts = 0
+        self.finished = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if import_seconds is not None:
+            self._timing("imports", import_seconds)
+        threading.Thread(target=self._run, name="startup", daemon=True).start()
+
+    @property
+    def ready(self):
+        return self.finished and not self.problems
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    # Why the assistant cannot be used at all, or None
+    def problem(self, assistant_id):
+        with self._lock:
+            return self.problems.get(assistant_id)
+
+    def _timing(self, step, seconds):
+        with self._lock:
+            self.timings[step] = round(seconds, 4)
+        if self.on_timing is not None:
+            self.on_timing(step, seconds)
+
+    def _fail(self, key, message):
+        logger.error("startup: %s", message)
+        with self._lock:
+            self.problems[key] = message
+        if self.on_problem is not None:
+            self.on_problem(key)
+
+    # Only an assistant the app serves keeps it from being ready
+    def _problem(self, assistant_id, message):
+        if assistant_id in self.required:
+            self._fail(assistant_id, message)
+        else:
+            self._warn(message)
+
+    def _warn(self, message):
+        logger.warning("startup: %s", message)
+        with self._lock:
+            self.warnings.append(message)
+            count = len(self.warnings)
+        if self.on_warning is not None:
+            self.on_warning(count)
+
+    def _run(self):
+        started = time.monotonic()
+        pending = self.assistant_ids
+        # One worker more than requests in flight, for loading the tool data alongside
+        with ThreadPoolExecutor(max(self.connections, len(pending)) + 1, thread_name_prefix="startup") as pool:
+            loading = pool.submit(self._load_tools) if self.preload is not None else None
+            while True:
+                self.attempts += 1
+                pending = self._retrieve(pool, pending)
+                if not pending:
+                    break
+                logger.warning("startup: retrying %s in %ss", ", ".join(pending), self.retry_seconds)
+                time.sleep(self.retry_seconds)
+            if loading is not None:
+                loading.result()
+        self._check_tools()
+        self._timing("total", time.monotonic() - started)
+        with self._lock:
+            self.finished = True
+        self._done.set()
+        if self.on_finish is not None:
+            self.on_finish(self.ready)
+        logger.info("startup %s in %.2fs: %s", "ready" if self.ready else "failed", time.monotonic() - started, self.timings)
+
+    def _load_tools(self):
+        started = time.monotonic()
+        try:
+            self.preload()
+        except Exception as e:
+            self._warn(f"tool data did not load, tool calls will load it again: {e}")
+        self._timing("tools", time.monotonic() - started)
+
+    def _get(self, assistant_id):
+        started = time.monotonic()
+        assistant = self.client.beta.assistants.retrieve(assistant_id)
+        return assistant, time.monotonic() - started
+
+    # Returns the assistants to try again
+    def _retrieve(self, pool, assistant_ids):
+        if not assistant_ids:
+            return []
+        started = time.monotonic()
+        futures = {assistant_id: pool.submit(self._get, assistant_id) for assistant_id in assistant_ids}
+        # Requests on top of those, in flight at the same time, open the rest of the pool
+        extra = [pool.submit(self._get, assistant_ids[0]) for _ in range(self.connections - len(assistant_ids))]
+        retry = []
+        for assistant_id, future in futures.items():
+            try:
+                assistant, seconds = future.result()
+            except FATAL_ERRORS as e:
+                self._problem(assistant_id, f"assistant {assistant_id} cannot be used: {e}")
+                continue
+            except Exception as e:
+                if not is_transient(e):
+                    self._problem(assistant_id, f"assistant {assistant_id} failed to load: {e!r}")
+                elif assistant_id in self.required:
+                    logger.warning("startup: could not retrieve assistant %s: %s", assistant_id, e)
+                    retry.append(assistant_id)
+                else:
+                    self._warn(f"assistant {assistant_id} was not warmed: {e}")
+                continue
+            with self._lock:
+                self.assistants[assistant_id] = assistant
+            self._timing(f"assistant:{assistant_id}", seconds)
+        for future in extra:
+            future.exception()
+        if self.attempts == 1:
+            self._timing("connections", time.monotonic() - started)
+        return retry
+
+    def _check_tools(self):
+        declared = set()
+        for assistant_id, assistant in self.assistants.items():
+            functions = {tool.function.name for tool in assistant.tools if tool.type == "function"}
+            declared |= functions
+            missing = sorted(functions - self.tool_map.keys())
+            if missing:
+                # Only calls to these functions fail, so the assistant itself stays usable
+                self._warn(f"assistant {assistant_id} declares functions not in TOOL_MAP: {', '.join(missing)}")
+        unused = sorted(self.tool_map.keys() - declared)
+        if self.assistants and unused:
+            logger.info("startup: TOOL_MAP functions no assistant declares: %s", ", ".join(unused))
+
+    def report(self):
+        with self._lock:
+            return {
+                "ready": self.finished and not self.problems,
+                "finished": self.finished,
+                "attempts": self.attempts,
+                "timings": dict(self.timings),
+                "assistants": {
+                    assistant_id: {
+                        "name": assistant.name,
+                        "model": assistant.model,
+                        "tools": [
+                            tool.function.name if tool.type == "function" else tool.type for tool in assistant.tools
+                        ],
+                    }
+                    for assistant_id, assistant in self.assistants.items()
+                },
+                "problems": dict(self.problems),
+                "warnings": list(self.warnings),
+            }
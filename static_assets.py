@@ -0,0 +1,101 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+# Streamlit static serving only sends png, jpg, gif and webp with an image
+# content type, so AVIF is not built
+FORMATS = ("webp", "png")
+# mkstemp creates files readable by their owner only; whoever serves or copies them may be another user
+FILE_MODE = 0o644
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "lossless": True, "method": 6},
+    "png": {"format": "PNG", "optimize": True},
+}
+
+
+class BuiltImage:
+    def __init__(self, paths, urls, width, height):
+        self.paths = paths
+        self.urls = urls
+        self.width = width
+        self.height = height
+
+    def sizes(self):
+        return {fmt: os.path.getsize(path) for fmt, path in self.paths.items()}
+
+
+# Resized, recompressed copies of the page's images. Each image is built once,
+# as WebP with a PNG fallback, under a name that carries a hash of the source
+# and the build settings, so later processes reuse the files and a changed
+# image gets a new URL. The files are served by Streamlit static serving; the
+# ?v= query makes it send a ten-year Cache-Control header. The page's images
+# are flat illustrations, so they are reduced to a 256 colour palette and
+# stored losslessly.
+class AssetPipeline:
+    def __init__(self, directory, url_prefix, colors=256):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.colors = colors
+        self._built = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # max_width is in image pixels, twice the widest CSS size for high density screens
+    def image(self, source, max_width):
+        key = (source, max_width)
+        with self._lock:
+            built = self._built.get(key)
+            if built is None:
+                built = self._built[key] = self._build(source, max_width)
+            return built
+
+    def _build(self, source, max_width):
+        with open(source, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data + f"|{max_width}|{self.colors}".encode()).hexdigest()[:16]
+        stem = os.path.splitext(os.path.basename(source))[0]
+        original = Image.open(io.BytesIO(data))
+        scale = min(1.0, max_width / original.width)
+        width, height = round(original.width * scale), round(original.height * scale)
+        image = None
+        paths = {}
+        urls = {}
+        for fmt in FORMATS:
+            name = f"{stem}-{digest}.{fmt}"
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                if image is None:
+                    image = self._reduce(original, (width, height))
+                self._write(image, path, fmt)
+            paths[fmt] = path
+            urls[fmt] = f"{self.url_prefix}/{name}?v={digest}"
+        return BuiltImage(paths, urls, width, height)
+
+    def _reduce(self, image, size):
+        image = image.convert("RGBA")
+        if image.size != size:
+            image = image.resize(size, Image.LANCZOS)
+        return image.quantize(self.colors, method=Image.Quantize.FASTOCTREE)
+
+    def _write(self, image, path, fmt):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".build-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                (image.convert("RGBA") if fmt == "webp" else image).save(f, **SAVE_OPTIONS[fmt])
+            os.chmod(temp_path, FILE_MODE)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                source: {"width": built.width, "height": built.height, **built.sizes()}
+                for (source, _), built in self._built.items()
+            }
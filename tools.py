@@ -1,6 +1,238 @@
+import asyncio
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from game_catalog import compact, get_catalog
+
+
 # example function
 def example_function(address):
     pass
 
 
-TOOL_MAP = {"example_function": example_function}
+def find_games(
+    players=None,
+    best_players=None,
+    min_rating=None,
+    min_weight=None,
+    max_weight=None,
+    max_play_time=None,
+    limit=10,
+):
+    games, more = get_catalog().find(
+        players=players,
+        best_players=best_players,
+        min_rating=min_rating,
+        min_weight=min_weight,
+        max_weight=max_weight,
+        max_play_time=max_play_time,
+        limit=limit,
+    )
+    return compact({"games": games, "more": more})
+
+
+def get_game(name):
+    game = get_catalog().get(name)
+    return compact(game if game is not None else {"error": f"No game named {name}"})
+
+
+def random_games(count=5):
+    return compact({"games": get_catalog().sample(count)})
+
+
+TOOL_MAP = {
+    "example_function": example_function,
+    "find_games": find_games,
+    "get_game": get_game,
+    "random_games": random_games,
+}
+
+
+# Loads what the tools read on their first call, so startup pays for it instead
+def preload():
+    get_catalog()
+
+
+TOOL_MAX_WORKERS = int(os.environ.get("TOOL_MAX_WORKERS", 8))
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT_SECONDS", 30))
+# Per-tool overrides, e.g. TOOL_TIMEOUTS='{"example_function": 5}'
+TOOL_TIMEOUTS = json.loads(os.environ.get("TOOL_TIMEOUTS", "{}"))
+
+
+def tool_error(error_type, message):
+    return json.dumps({"error": {"type": error_type, "message": message}})
+
+
+def format_tool_output(result):
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, default=str)
+
+
+# Runs the function calls of one required action concurrently. Sync tools use a
+# bounded thread pool; async tools share one event loop. Each call's deadline
+# starts when it starts running, so calls queued behind others get their full
+# time. A call that misses its deadline, or waits longer than that for a free
+# worker, is reported to the model as an error instead of blocking the run.
+# Threads cannot be interrupted, so a sync call past its deadline keeps its
+# worker until it returns; those workers are counted as stuck, and once every
+# worker is stuck new sync calls fail at once instead of queueing.
+class ToolExecutor:
+    def __init__(
+        self,
+        tool_map,
+        max_workers=TOOL_MAX_WORKERS,
+        default_timeout=TOOL_TIMEOUT,
+        timeouts=None,
+        listener=None,
+        on_stuck=None,
+    ):
+        self.tool_map = tool_map
+        self.listener = listener
+        self.on_stuck = on_stuck
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts if timeouts is not None else TOOL_TIMEOUTS
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="tool")
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self.loop.run_forever, name="tool-event-loop", daemon=True
+        ).start()
+        self._stats = {}
+        self._running = 0
+        self._stuck = 0
+        self._lock = threading.Lock()
+
+    def _record(self, name, seconds, outcome):
+        with self._lock:
+            stats = self._stats.setdefault(
+                name,
+                {"calls": 0, "errors": 0, "timeouts": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+            )
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if outcome == "error":
+                stats["errors"] += 1
+            elif outcome == "timeout":
+                stats["timeouts"] += 1
+        if self.listener is not None:
+            self.listener(name, seconds, outcome)
+
+    def _call(self, started_at, function, arguments):
+        started_at.append(time.monotonic())
+        with self._lock:
+            self._running += 1
+        try:
+            return function(**arguments)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _done(self, future):
+        future.finished_at = time.monotonic()
+        with self._lock:
+            if not getattr(future, "stuck", False):
+                return
+            self._stuck -= 1
+            stuck = self._stuck
+        if self.on_stuck is not None:
+            self.on_stuck(stuck)
+
+    # Counts the worker of a sync call past its deadline as stuck until the call returns
+    def _abandon(self, future):
+        with self._lock:
+            if future.done():
+                return
+            future.stuck = True
+            self._stuck += 1
+            stuck = self._stuck
+        if self.on_stuck is not None:
+            self.on_stuck(stuck)
+
+    def submit(self, name, arguments):
+        function = self.tool_map[name]
+        submitted_at = time.monotonic()
+        if inspect.iscoroutinefunction(function):
+            future = asyncio.run_coroutine_threadsafe(function(**arguments), self.loop)
+            future.started_at = [submitted_at]
+        else:
+            started_at = []
+            future = self.pool.submit(self._call, started_at, function, arguments)
+            future.started_at = started_at
+        future.submitted_at = submitted_at
+        future.add_done_callback(self._done)
+        return future
+
+    # Waits for one call; returns its output and outcome
+    def _wait(self, name, timeout, future):
+        while True:
+            started = bool(future.started_at)
+            deadline = (future.started_at[0] if started else future.submitted_at) + timeout
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                if started:
+                    future.cancel()
+                    self._abandon(future)
+                    return tool_error("timeout", f"{name} did not finish within {timeout:g} seconds"), "timeout"
+                if future.cancel():
+                    return tool_error("busy", f"{name} did not get a worker within {timeout:g} seconds"), "timeout"
+                # It started while the wait timed out; its own deadline applies from here
+                continue
+            except Exception as e:
+                return tool_error(type(e).__name__, str(e)), "error"
+            return format_tool_output(result), "ok"
+
+    def run(self, tool_calls):
+        pending = []
+        outputs = {}
+        for tool_call in tool_calls:
+            name = tool_call.function.name
+            if name not in self.tool_map:
+                outputs[tool_call.id] = tool_error("unknown_tool", f"No tool named {name}")
+                self._record(name, 0.0, "error")
+                continue
+            if self._stuck >= self.max_workers and not inspect.iscoroutinefunction(self.tool_map[name]):
+                outputs[tool_call.id] = tool_error(
+                    "busy", f"Every tool worker is stuck on an earlier call; {name} was not run"
+                )
+                self._record(name, 0.0, "timeout")
+                continue
+            try:
+                arguments = json.loads(tool_call.function.arguments or "{}")
+                future = self.submit(name, arguments)
+            except Exception as e:
+                outputs[tool_call.id] = tool_error("invalid_arguments", str(e))
+                self._record(name, 0.0, "error")
+                continue
+            timeout = float(self.timeouts.get(name, self.default_timeout))
+            pending.append((tool_call.id, name, timeout, future))
+
+        for tool_call_id, name, timeout, future in pending:
+            outputs[tool_call_id], outcome = self._wait(name, timeout, future)
+            started_at = future.started_at[0] if future.started_at else future.submitted_at
+            self._record(name, getattr(future, "finished_at", time.monotonic()) - started_at, outcome)
+
+        return [
+            {"tool_call_id": tool_call.id, "output": outputs[tool_call.id]}
+            for tool_call in tool_calls
+        ]
+
+    def workers(self):
+        with self._lock:
+            return {"max": self.max_workers, "running": self._running, "stuck": self._stuck}
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    **stats,
+                    "mean_seconds": stats["total_seconds"] / stats["calls"],
+                }
+                for name, stats in self._stats.items()
+            }
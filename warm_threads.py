@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import deque
+
+
+# Keeps a few empty Assistants threads created ahead of time so a new
+# conversation can skip the create_thread round trip. Threads that sit unused
+# for longer than max_age_seconds are deleted and replaced.
+class WarmThreadPool:
+    def __init__(self, client, size, max_age_seconds=3600, refill_interval=30, on_error=None):
+        self.client = client
+        self.size = size
+        self.max_age_seconds = max_age_seconds
+        self.refill_interval = refill_interval
+        self.on_error = on_error
+        self._threads = deque()
+        self._retired = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        threading.Thread(target=self._maintain, name="warm-thread-pool", daemon=True).start()
+
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._threads:
+                thread, created_at = self._threads.popleft()
+                if now - created_at < self.max_age_seconds:
+                    self.hits += 1
+                    self._wake.set()
+                    return thread
+                self._retired.append(thread)
+            self.misses += 1
+        self._wake.set()
+        return None
+
+    def _delete(self, thread):
+        try:
+            self.client.beta.threads.delete(thread.id)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+
+    def _maintain(self):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                while self._threads and now - self._threads[0][1] >= self.max_age_seconds:
+                    self._retired.append(self._threads.popleft()[0])
+                retired, self._retired = self._retired, []
+                missing = self.size - len(self._threads)
+            for thread in retired:
+                self._delete(thread)
+            for _ in range(missing):
+                try:
+                    thread = self.client.beta.threads.create()
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(e)
+                    break
+                with self._lock:
+                    self._threads.append((thread, time.monotonic()))
+            self._wake.wait(self.refill_interval)
+
+    def stats(self):
+        with self._lock:
+            return {"ready": len(self._threads), "hits": self.hits, "misses": self.misses}